@@ -0,0 +1,904 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import io
+import os
+import copy
+import time
+import zlib
+import struct
+import shutil
+import fnmatch
+import zipfile
+import tempfile
+import threading
+import collections
+import concurrent.futures
+
+#endregion
+#region Global Variables
+
+# Archive
+archive_block = 1024 * 1024 # bytes read per cycle
+archive_header = "<4s2B4HL2L2H" # zip local file header
+archive_header_size = struct.calcsize( archive_header )
+archive_descriptor = b"PK\x07\x08" # optional signature of a data descriptor
+archive_spool = 32 * 1024 * 1024 # compressed members read at random are inflated once into memory up to this size then to disk
+
+# Compression
+archive_compressed = [ # formats that are already compressed
+    ".kra",
+    ".krz",
+    ".ora",
+    ".gif",
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".psd",
+    ".webp",
+    ".svgz",
+    ".zip",
+    ]
+archive_method = {
+    "stored" : zipfile.ZIP_STORED,
+    "deflate" : zipfile.ZIP_DEFLATED,
+    "bzip2" : zipfile.ZIP_BZIP2,
+    "lzma" : zipfile.ZIP_LZMA,
+    }
+
+#endregion
+#region Functions
+
+def Member_Path( directory, arcname ):
+    # Refuse names that escape the project folder
+    parts = [ p for p in arcname.split( "/" ) if p not in ( "", "." ) ]
+    if ( ".." in parts or os.path.isabs( arcname ) or len( parts ) == 0 ):
+        return None
+    return os.path.normpath( os.path.join( directory, *parts ) )
+def Member_Write( archive, info, path ):
+    with archive.open( info, "r" ) as source:
+        Stream_Write( source, info, path )
+def Stream_Write( source, info, path ):
+    # Written aside and renamed so a save never reads half a file
+    temp = path + ".part"
+    with open( temp, "wb" ) as target:
+        shutil.copyfileobj( source, target, archive_block )
+    # Member time kept so caches keyed by size and mtime survive a reopen
+    stamp = Member_Time( info )
+    if stamp != None:
+        os.utime( temp, ( stamp, stamp ) )
+    os.replace( temp, path )
+def Member_Open( pool, source, directory, path ):
+    # Binary file of a project file, from disk or still inside the ZIP ( safe in worker threads )
+    if os.path.exists( path ) == True:
+        return open( path, "rb" )
+    arcname = os.path.relpath( os.path.normpath( path ), directory ).replace( os.sep, "/" )
+    return pool.Stream( source, arcname )
+def Member_Time( info ):
+    try:return time.mktime( info.date_time + ( 0, 0, -1 ) )
+    except ( OverflowError, ValueError ):return None
+
+
+#endregion
+
+
+class Archive_Policy():
+    """
+    Compression type and level of each member chosen by extension
+    """
+
+    #region Initialize
+
+    def __init__( self, extensions=[], method="deflate", level=6, store=True ):
+        # Variables
+        self.method = method if method in archive_method else "deflate"
+        self.level = level
+        self.store = store # already compressed formats are stored
+        self.compress_type = archive_method[self.method]
+
+        # Extension Table ( *.ext lists like file_image and file_text )
+        self.table = {}
+        for entry in extensions:
+            extension = entry.replace( "*", "" ).lower()
+            if ( self.store == True and extension in archive_compressed ):
+                self.table[extension] = zipfile.ZIP_STORED
+            else:
+                self.table[extension] = self.compress_type
+
+    #endregion
+    #region Policy
+
+    def Member_Type( self, arcname ):
+        extension = os.path.splitext( arcname )[1].lower()
+        if extension in self.table:
+            compress_type = self.table[extension]
+        elif ( self.store == True and extension in archive_compressed ):
+            compress_type = zipfile.ZIP_STORED
+        else:
+            compress_type = self.compress_type
+        return compress_type
+    def Member_Level( self, compress_type ):
+        if compress_type in ( zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2 ):
+            level = self.Level_Range( compress_type )
+        else:
+            level = None
+        return level
+    def Level_Range( self, compress_type ):
+        try:level = int( self.level )
+        except:level = 6
+        if compress_type == zipfile.ZIP_BZIP2:
+            level = min( max( level, 1 ), 9 )
+        else:
+            level = min( max( level, 0 ), 9 )
+        return level
+
+    #endregion
+
+
+class Archive_Incremental():
+    """
+    Rewrite the Project ZIP copying unchanged members without recompressing them
+    """
+
+    #region Initialize
+
+    def __init__( self, policy=None ):
+        # Compression
+        self.policy = policy if policy != None else Archive_Policy()
+        # Signature of each member since the last save { arcname : ( size, mtime_ns ) }
+        self.signature = {}
+        # Lazy Open ( members still inside the archive ) { arcname : file_size } { arcname : mtime }
+        self.source = None
+        self.pending = {}
+        self.pending_time = {}
+        # Last Save
+        self.report = self.Report_Empty()
+        # Shared readers ( Archive_Pool ) released before the ZIP is replaced
+        self.pool = None
+
+    def Report_Empty( self ):
+        report = {
+            "copied" : 0,
+            "compressed" : 0,
+            "bytes_copied" : 0,
+            "bytes_compressed" : 0,
+            "changed" : [],
+            "time" : 0,
+            }
+        return report
+
+    #endregion
+    #region Signature
+
+    def Directory_Scan( self, directory ):
+        # Variables
+        folders = []
+        files = {}
+
+        # Walk ( sorted like shutil.make_archive )
+        for root, dirnames, filenames in os.walk( directory ):
+            dirnames.sort()
+            relative = os.path.relpath( root, directory )
+            if relative != ".":
+                folders.append( relative.replace( os.sep, "/" ) + "/" )
+            for name in sorted( filenames ):
+                path = os.path.join( root, name )
+                if relative == ".":
+                    arcname = name
+                else:
+                    arcname = relative.replace( os.sep, "/" ) + "/" + name
+                try:
+                    stat = os.stat( path )
+                    files[arcname] = ( path, stat.st_size, stat.st_mtime_ns )
+                except OSError:
+                    pass
+
+        # Return
+        return folders, files
+    def Signature_Reset( self, directory ):
+        # Files on disk are equal to the archive ( after unpack or save )
+        self.signature = {}
+        self.source = None
+        self.pending = {}
+        self.pending_time = {}
+        if directory != None and os.path.isdir( directory ):
+            folders, files = self.Directory_Scan( directory )
+            for arcname, entry in files.items():
+                self.signature[arcname] = ( entry[1], entry[2] )
+    def Signature_Clear( self ):
+        self.signature = {}
+        self.report = self.Report_Empty()
+        self.source = None
+        self.pending = {}
+        self.pending_time = {}
+
+    def File_CRC( self, path ):
+        crc = 0
+        with open( path, "rb" ) as file:
+            while True:
+                block = file.read( archive_block )
+                if not block:
+                    break
+                crc = zlib.crc32( block, crc )
+        return crc & 0xffffffff
+    def Member_Unchanged( self, arcname, entry, info ):
+        # Variables
+        path, size, mtime = entry
+        compress_type = self.policy.Member_Type( arcname )
+
+        # Checks
+        unchanged = False
+        if ( info != None and info.file_size == size and info.compress_type == compress_type ):
+            if self.signature.get( arcname, None ) == ( size, mtime ):
+                unchanged = True
+            else:
+                # Touched but maybe not modified ( reading is cheaper than compressing )
+                try:unchanged = self.File_CRC( path ) == info.CRC
+                except OSError:unchanged = False
+        return unchanged
+
+    #endregion
+    #region Write
+
+    def Member_Copy( self, source, archive, info ):
+        # Local Header
+        source.seek( info.header_offset )
+        header = source.read( archive_header_size )
+        fields = struct.unpack( archive_header, header )
+        local = source.read( fields[10] + fields[11] )
+        if len( local ) != fields[10] + fields[11]:
+            raise zipfile.BadZipFile( f"Truncated member { info.filename }" )
+
+        # Raw Bytes ( compressed data is never touched )
+        archive.fp.seek( archive.start_dir )
+        offset = archive.fp.tell()
+        archive.fp.write( header )
+        archive.fp.write( local )
+        remaining = info.compress_size
+        while remaining > 0:
+            block = source.read( min( archive_block, remaining ) )
+            if not block:
+                raise zipfile.BadZipFile( f"Truncated member { info.filename }" )
+            archive.fp.write( block )
+            remaining -= len( block )
+        # Data Descriptor ( streamed members keep their sizes after the data )
+        if info.flag_bits & 0x08:
+            archive.fp.write( self.Descriptor_Read( source, info, local[fields[10]:] ) )
+
+        # Central Directory Entry
+        zinfo = copy.copy( info )
+        zinfo.header_offset = offset
+        zinfo.extra = self.Extra_Strip( info.extra )
+        archive.filelist.append( zinfo )
+        archive.NameToInfo[zinfo.filename] = zinfo
+        archive.start_dir = archive.fp.tell()
+    def Descriptor_Read( self, source, info, extra ):
+        # crc32 and both sizes, 8 byte sizes when the local header has a ZIP64 field
+        zip64 = False
+        i = 0
+        while i + 4 <= len( extra ):
+            tag, length = struct.unpack( "<HH", extra[i:i+4] )
+            if tag == 1:
+                zip64 = True
+            i += 4 + length
+        length = 20 if zip64 == True else 12
+        descriptor = source.read( 4 )
+        if descriptor == archive_descriptor:
+            descriptor += source.read( length )
+        else:
+            descriptor += source.read( length - 4 )
+        if len( descriptor ) < length:
+            raise zipfile.BadZipFile( f"Truncated descriptor { info.filename }" )
+        return descriptor
+    def Extra_Strip( self, extra ):
+        # Remove the ZIP64 field, it is rebuilt with the new offset if needed
+        strip = b""
+        i = 0
+        while i + 4 <= len( extra ):
+            tag, length = struct.unpack( "<HH", extra[i:i+4] )
+            if tag != 1:
+                strip += extra[i:i+4+length]
+            i += 4 + length
+        return strip
+
+    def Save( self, directory, destination, progress=None ):
+        # Variables
+        start = time.perf_counter()
+        report = self.Report_Empty()
+        pending = dict( self.pending ) # before the scan so nothing extracted in between is lost
+        folders, files = self.Directory_Scan( directory )
+        pending = [ arcname for arcname in pending if arcname not in files ]
+        total = len( folders ) + len( files ) + len( pending )
+        index = 0
+
+        # Previous Archive
+        previous = None
+        infos = {}
+        if os.path.isfile( destination ) and zipfile.is_zipfile( destination ):
+            previous = zipfile.ZipFile( destination, "r" )
+            for info in previous.infolist():
+                infos[info.filename] = info
+
+        # Temporary Archive ( same folder so the swap is atomic )
+        parent = os.path.dirname( os.path.abspath( destination ) )
+        handle, temp = tempfile.mkstemp( suffix=".part", dir=parent )
+        os.close( handle )
+        if previous != None:
+            shutil.copymode( destination, temp )
+        else:
+            os.chmod( temp, 0o644 )
+        try:
+            source = open( destination, "rb" ) if previous != None else None
+            try:
+                with zipfile.ZipFile( temp, "w", zipfile.ZIP_DEFLATED ) as archive:
+                    # Folders
+                    for arcname in folders:
+                        path = os.path.join( directory, arcname[:-1] )
+                        archive.write( path, arcname )
+                        index += 1
+                        if progress != None:
+                            progress( index, total )
+                    # Files
+                    for arcname, entry in files.items():
+                        info = infos.get( arcname, None )
+                        if self.Member_Unchanged( arcname, entry, info ) == True:
+                            self.Member_Copy( source, archive, info )
+                            report["copied"] += 1
+                            report["bytes_copied"] += info.compress_size
+                        else:
+                            compress_type = self.policy.Member_Type( arcname )
+                            archive.write( entry[0], arcname, compress_type, self.policy.Member_Level( compress_type ) )
+                            report["compressed"] += 1
+                            report["bytes_compressed"] += entry[1]
+                            report["changed"].append( arcname )
+                        index += 1
+                        if progress != None:
+                            progress( index, total )
+                    # Lazy Members ( never extracted )
+                    for arcname in pending:
+                        info = infos.get( arcname, None )
+                        if info != None:
+                            self.Member_Copy( source, archive, info )
+                            report["copied"] += 1
+                            report["bytes_copied"] += info.compress_size
+                        index += 1
+                        if progress != None:
+                            progress( index, total )
+            finally:
+                if source != None:
+                    source.close()
+                if previous != None:
+                    previous.close()
+            if self.pool != None:
+                self.pool.Replace( temp, destination )
+            else:
+                os.replace( temp, destination )
+        except:
+            try:os.remove( temp )
+            except OSError:pass
+            raise
+
+        # Signature of what was written
+        self.signature = {}
+        for arcname, entry in files.items():
+            self.signature[arcname] = ( entry[1], entry[2] )
+
+        # Return
+        report["time"] = time.perf_counter() - start
+        self.report = report
+        return report
+
+    #endregion
+    #region Lazy
+
+    def Member_Extract( self, archive, info, path ):
+        Member_Write( archive, info, path )
+        stat = os.stat( path )
+        self.signature[info.filename] = ( stat.st_size, stat.st_mtime_ns )
+
+    def Lazy_Open( self, source, directory, eager=[] ):
+        # Variables
+        self.signature = {}
+        self.source = source
+        self.pending = {}
+        self.pending_time = {}
+
+        # Structure and small members only
+        with zipfile.ZipFile( source, "r" ) as archive:
+            for info in archive.infolist():
+                path = Member_Path( directory, info.filename )
+                if path == None:
+                    continue
+                if info.is_dir():
+                    os.makedirs( path, exist_ok=True )
+                elif ( "/" not in info.filename or info.filename.startswith( tuple( eager ) ) ):
+                    os.makedirs( os.path.dirname( path ), exist_ok=True )
+                    self.Member_Extract( archive, info, path )
+                else:
+                    self.pending[info.filename] = info.file_size
+                    self.pending_time[info.filename] = Member_Time( info )
+    def Lazy_Arcname( self, directory, path ):
+        relative = os.path.relpath( os.path.normpath( path ), directory )
+        return relative.replace( os.sep, "/" )
+    def Lazy_Check( self, directory, path ):
+        return self.Lazy_Arcname( directory, path ) in self.pending
+    def Lazy_Extract( self, directory, path ):
+        # Extract one member when it is really needed
+        arcname = self.Lazy_Arcname( directory, path )
+        if ( arcname in self.pending and self.source != None ):
+            target = Member_Path( directory, arcname )
+            if ( target != None and os.path.exists( target ) == False ):
+                if self.pool != None:
+                    info = self.pool.Info( self.source, arcname )
+                    with self.pool.Stream( self.source, arcname ) as source:
+                        Stream_Write( source, info, target )
+                    stat = os.stat( target )
+                    self.signature[arcname] = ( stat.st_size, stat.st_mtime_ns )
+                else:
+                    with zipfile.ZipFile( self.source, "r" ) as archive:
+                        self.Member_Extract( archive, archive.getinfo( arcname ), target )
+            self.pending.pop( arcname, None )
+            self.pending_time.pop( arcname, None )
+    def Lazy_Read( self, directory, path ):
+        # Bytes of a member without extracting it
+        data = None
+        arcname = self.Lazy_Arcname( directory, path )
+        if ( arcname in self.pending and self.source != None ):
+            if self.pool != None:
+                data = self.pool.Read( self.source, arcname )
+            else:
+                with zipfile.ZipFile( self.source, "r" ) as archive:
+                    data = archive.read( arcname )
+        return data
+    def Lazy_Stream( self, directory, path ):
+        # File object of a member that keeps the archive open until it is closed
+        arcname = self.Lazy_Arcname( directory, path )
+        if self.pool != None:
+            return self.pool.Stream( self.source, arcname )
+        archive = zipfile.ZipFile( self.source, "r" )
+        try:member = archive.open( arcname, "r" )
+        finally:archive.close()
+        return member
+    def Lazy_Size( self, directory, path ):
+        return self.pending.get( self.Lazy_Arcname( directory, path ), None )
+    def Lazy_Key( self, directory, path ):
+        # ( size, mtime_ns ) the member will have once extracted
+        arcname = self.Lazy_Arcname( directory, path )
+        if arcname not in self.pending:
+            return None
+        stamp = self.pending_time.get( arcname, None )
+        return ( self.pending[arcname], int( stamp * 1e9 ) if stamp != None else 0 )
+    def Lazy_List( self, directory, folder, filters ):
+        # Paths of pending members directly inside a folder
+        lista = []
+        for arcname in self.pending:
+            parent, name = arcname.rsplit( "/", 1 ) if "/" in arcname else ( "", arcname )
+            if parent == folder:
+                lowered = name.lower()
+                if ( len( filters ) == 0 or any( fnmatch.fnmatch( lowered, f ) for f in filters ) ):
+                    lista.append( os.path.normpath( os.path.join( directory, folder, name ) ) )
+        return lista
+
+    #endregion
+
+
+class Archive_Extract():
+    """
+    Unpack the Project ZIP in parallel with one ZipFile handle per worker
+    """
+
+    #region Initialize
+
+    def __init__( self, workers=None ):
+        # Variables
+        self.workers = workers if workers != None else min( 8, os.cpu_count() or 1 )
+        self.cancel = threading.Event()
+        self.lock = threading.Lock()
+        self.done = 0
+        self.total = 0
+
+    #endregion
+    #region Extract
+
+    def Cancel( self ):
+        self.cancel.set()
+    def Bins( self, infos, count ):
+        # Largest members first on the lightest worker so big pages run side by side
+        bins = [ [] for i in range( 0, count ) ]
+        load = [ 0 ] * count
+        for info in sorted( infos, key=lambda i: i.compress_size, reverse=True ):
+            index = load.index( min( load ) )
+            bins[index].append( info )
+            load[index] += info.compress_size + 1
+        return [ b for b in bins if len( b ) > 0 ]
+    def Worker( self, source, directory, infos ):
+        with zipfile.ZipFile( source, "r" ) as archive:
+            for info in infos:
+                if self.cancel.is_set():
+                    return
+                path = Member_Path( directory, info.filename )
+                if path != None:
+                    Member_Write( archive, info, path )
+                with self.lock:
+                    self.done += info.compress_size
+    def Extract( self, source, directory, progress=None ):
+        # Variables
+        self.cancel.clear()
+        self.done = 0
+        completed = False
+
+        try:
+            # Structure
+            with zipfile.ZipFile( source, "r" ) as archive:
+                infos = archive.infolist()
+            files = []
+            for info in infos:
+                path = Member_Path( directory, info.filename )
+                if path == None:
+                    continue
+                if info.is_dir():
+                    os.makedirs( path, exist_ok=True )
+                else:
+                    os.makedirs( os.path.dirname( path ), exist_ok=True )
+                    files.append( info )
+            self.total = sum( info.compress_size for info in files )
+
+            # Workers
+            bins = self.Bins( files, self.workers )
+            with concurrent.futures.ThreadPoolExecutor( max_workers=max( len( bins ), 1 ) ) as executor:
+                futures = [ executor.submit( self.Worker, source, directory, b ) for b in bins ]
+                pending = set( futures )
+                while len( pending ) > 0:
+                    finished, pending = concurrent.futures.wait( pending, timeout=0.05 )
+                    if progress != None:
+                        progress( self.done, self.total )
+                for future in futures:
+                    future.result() # raise worker errors
+            completed = self.cancel.is_set() == False
+        finally:
+            # Partial folder is removed
+            if completed == False:
+                shutil.rmtree( directory, ignore_errors=True )
+
+        return completed
+
+    #endregion
+
+
+class Member_Window( io.RawIOBase ):
+    """
+    Seekable view of a stored member so a nested ZIP is read in place
+    """
+
+    #region Initialize
+
+    def __init__( self, file, offset, size ):
+        super( Member_Window, self ).__init__()
+        self.file = file
+        self.offset = offset
+        self.size = size
+        self.position = 0
+
+    def close( self ):
+        if self.closed == False:
+            self.file.close()
+        super( Member_Window, self ).close()
+
+    #endregion
+    #region File
+
+    def readable( self ):
+        return True
+    def seekable( self ):
+        return True
+    def tell( self ):
+        return self.position
+    def seek( self, offset, whence=io.SEEK_SET ):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max( 0, offset )
+        return self.position
+    def readinto( self, buffer ):
+        count = min( len( buffer ), self.size - self.position )
+        if count <= 0:
+            return 0
+        self.file.seek( self.offset + self.position )
+        data = self.file.read( count )
+        buffer[:len( data )] = data
+        self.position += len( data )
+        return len( data )
+
+    #endregion
+
+
+class Archive_Pool():
+    """
+    Open ZIP readers shared by path so each central directory is parsed once
+    """
+
+    #region Initialize
+
+    def __init__( self, handles=16, linger=True ):
+        # Variables
+        self.handles = handles # readers kept
+        self.linger = linger # keep files open between reads ( False where open files block renames )
+        self.lock = threading.Lock()
+        # Readers { path : [ ( size, mtime_ns ), ZipFile ] }
+        self.archives = collections.OrderedDict()
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #endregion
+    #region Readers
+
+    def Archive( self, path ):
+        # Called with the lock held
+        stat = os.stat( path )
+        key = ( stat.st_size, stat.st_mtime_ns )
+        entry = self.archives.get( path, None )
+        if ( entry != None and entry[0] == key ):
+            self.hits += 1
+            self.archives.move_to_end( path )
+            return entry[1] # without linger only the parsed directory is kept
+        if entry != None:
+            self.Archive_Close( self.archives.pop( path )[1] )
+        self.misses += 1
+        archive = zipfile.ZipFile( path, "r" )
+        self.archives[path] = [ key, archive ]
+        while len( self.archives ) > self.handles:
+            self.evictions += 1
+            self.Archive_Close( self.archives.popitem( last=False )[1][1] )
+        return archive
+    def Archive_Stale( self, path ):
+        # Called with the lock held, drops a reader whose ZIP changed without opening the file
+        entry = self.archives.get( path, None )
+        if entry == None:
+            return
+        try:
+            stat = os.stat( path )
+            key = ( stat.st_size, stat.st_mtime_ns )
+        except OSError:
+            key = None
+        if entry[0] != key:
+            self.Archive_Close( self.archives.pop( path )[1] )
+    def Archive_Release( self, archive ):
+        # Without linger the file closes after each use and the directory stays parsed
+        if ( self.linger == False and archive.fp != None ):
+            archive.fp.close()
+            archive.fp = None
+    def Archive_Close( self, archive ):
+        # Open members keep their file until they are closed
+        archive.close()
+
+    def Read( self, path, name ):
+        with self.Stream( path, name ) as member:
+            return member.read()
+    def Stream( self, path, name ):
+        with self.lock:
+            if self.linger == True:
+                archive = self.Archive( path )
+                return archive.open( name, "r" )
+            # A reader of its own, the file closes with the member ( nothing is read into memory )
+            self.Archive_Stale( path )
+            archive = zipfile.ZipFile( path, "r" )
+            try:return archive.open( name, "r" )
+            finally:archive.close()
+    def File( self, path, name ):
+        # Seekable member, read in place when stored and inflated once when compressed
+        with self.lock:
+            archive = self.Archive( path )
+            self.Archive_Release( archive )
+            info = archive.getinfo( name )
+        if ( info.compress_type == zipfile.ZIP_STORED and info.flag_bits & 0x01 == 0 ):
+            file = open( path, "rb" )
+            try:
+                file.seek( info.header_offset )
+                fields = struct.unpack( archive_header, file.read( archive_header_size ) )
+                if fields[0] != b"PK\x03\x04":
+                    raise zipfile.BadZipFile( f"Bad local header { name }" )
+                offset = info.header_offset + archive_header_size + fields[10] + fields[11]
+            except:
+                file.close()
+                raise
+            return Member_Window( file, offset, info.file_size )
+        spool = tempfile.SpooledTemporaryFile( max_size=archive_spool )
+        with self.Stream( path, name ) as member:
+            shutil.copyfileobj( member, spool, archive_block )
+        spool.seek( 0 )
+        return spool
+    def Names( self, path ):
+        with self.lock:
+            archive = self.Archive( path )
+            self.Archive_Release( archive )
+            return archive.namelist()
+    def Info( self, path, name ):
+        with self.lock:
+            archive = self.Archive( path )
+            self.Archive_Release( archive )
+            return archive.getinfo( name )
+    def Close( self, path=None ):
+        # Before a ZIP is replaced ( all readers when path is None )
+        with self.lock:
+            self.Close_Locked( path )
+    def Close_Locked( self, path ):
+        for item in list( self.archives.keys() ):
+            if ( path == None or os.path.normpath( item ) == os.path.normpath( path ) ):
+                self.Archive_Close( self.archives.pop( item )[1] )
+    def Replace( self, temp, path ):
+        # Readers closed and the ZIP swapped with no read in between
+        with self.lock:
+            self.Close_Locked( path )
+            os.replace( temp, path )
+    def Stats( self ):
+        with self.lock:
+            return { "hits" : self.hits, "misses" : self.misses, "evictions" : self.evictions, "open" : len( self.archives ) }
+
+    #endregion
+
+
+#region Benchmark
+
+def Benchmark_Project( directory, pages, page_size ):
+    # Project Structure
+    for folder in [ "IMAGES", "TEXTS", "TRASH" ]:
+        os.makedirs( os.path.join( directory, folder ), exist_ok=True )
+    with open( os.path.join( directory, "control.eo" ), "w" ) as control:
+        control.write( "project_pages\n" )
+    with open( os.path.join( directory, "thumbnail.png" ), "wb" ) as thumbnail:
+        thumbnail.write( os.urandom( 1024 ) )
+    # Pages ( half random half repetitive so deflate has work to do )
+    for i in range( 0, pages ):
+        name = f"page_{ str( i + 1 ).zfill( 4 ) }"
+        Benchmark_Page( os.path.join( directory, "IMAGES", f"{ name }.kra" ), page_size )
+        with open( os.path.join( directory, "TEXTS", f"{ name }.eo" ), "w" ) as note:
+            note.write( f"note { name }\n" * 20 )
+def Benchmark_Page( path, page_size ):
+    half = page_size // 2
+    with open( path, "wb" ) as page:
+        page.write( os.urandom( half ) )
+        page.write( bytes( page_size - half ) )
+def Benchmark_Save( pages=60, page_size=1024*1024, changes=[ 0, 1, 4, 16 ] ):
+    """
+    Save time of the incremental writer against shutil.make_archive
+    Both deflate every member so only the incremental copy is compared
+    """
+    lines = []
+    with tempfile.TemporaryDirectory() as temp:
+        directory = os.path.join( temp, "bench.temp" )
+        destination = os.path.join( temp, "bench.project_pages.zip" )
+        Benchmark_Project( directory, pages, page_size )
+
+        # Full Archive
+        start = time.perf_counter()
+        shutil.make_archive( destination[:-4], "zip", directory )
+        full = time.perf_counter() - start
+        lines.append( f"project { pages } pages x { page_size // 1024 } KiB" )
+        lines.append( f"make_archive          { full:8.3f} s" )
+
+        # Initial Archive ( nothing to copy yet )
+        os.remove( destination )
+        writer = Archive_Incremental( Archive_Policy( [], "deflate", 6, False ) )
+        report = writer.Save( directory, destination )
+        lines.append( f"initial write         { report['time']:8.3f} s  ( { report['compressed'] } compressed )" )
+
+        # Incremental Archive
+        for count in changes:
+            for i in range( 0, count ):
+                name = f"page_{ str( i + 1 ).zfill( 4 ) }.kra"
+                Benchmark_Page( os.path.join( directory, "IMAGES", name ), page_size )
+            report = writer.Save( directory, destination )
+            changed = report["bytes_compressed"] // 1024
+            speedup = full / report["time"] if report["time"] > 0 else 0
+            lines.append( f"incremental { count:3d} pages { report['time']:8.3f} s  x{ speedup:.1f}  ( { changed } KiB compressed, { report['copied'] } copied )" )
+
+        # Verify
+        with zipfile.ZipFile( destination, "r" ) as archive:
+            bad = archive.testzip()
+        lines.append( f"archive test          { 'OK' if bad == None else bad }" )
+
+    for line in lines:
+        print( line )
+    return lines
+def Benchmark_Container( path, page_size ):
+    # Krita like document ( zip of deflated layers plus a png preview )
+    with zipfile.ZipFile( path, "w", zipfile.ZIP_DEFLATED ) as document:
+        document.writestr( "mimetype", "application/x-krita", zipfile.ZIP_STORED )
+        document.writestr( "maindoc.xml", "<DOC><IMAGE/></DOC>\n" * 50 )
+        layer = ( os.urandom( 64 ) + bytes( 192 ) ) * ( page_size // 512 )
+        document.writestr( "layers/layer1", layer )
+        document.writestr( "preview.png", os.urandom( page_size // 16 ), zipfile.ZIP_STORED )
+def Benchmark_Policy( pages=40, page_size=2*1024*1024 ):
+    """
+    Save time against archive size for each compression policy
+    """
+    extensions = [ "*.kra", "*.png", "*.jpg", "*.txt", "*.eo" ]
+    policies = [
+        ( "deflate all ( old )", Archive_Policy( extensions, "deflate", 6, False ) ),
+        ( "stored + deflate 6", Archive_Policy( extensions, "deflate", 6 ) ),
+        ( "stored + deflate 1", Archive_Policy( extensions, "deflate", 1 ) ),
+        ( "stored + deflate 9", Archive_Policy( extensions, "deflate", 9 ) ),
+        ( "stored + bzip2 9", Archive_Policy( extensions, "bzip2", 9 ) ),
+        ( "stored + lzma", Archive_Policy( extensions, "lzma", 6 ) ),
+        ]
+    lines = []
+    with tempfile.TemporaryDirectory() as temp:
+        directory = os.path.join( temp, "bench.temp" )
+        Benchmark_Project( directory, 0, 0 )
+        for i in range( 0, pages ):
+            name = f"page_{ str( i + 1 ).zfill( 4 ) }"
+            if i % 2 == 0:
+                Benchmark_Container( os.path.join( directory, "IMAGES", f"{ name }.kra" ), page_size )
+            else:
+                with open( os.path.join( directory, "IMAGES", f"{ name }.png" ), "wb" ) as page:
+                    page.write( os.urandom( page_size ) ) # png data is already deflated
+            with open( os.path.join( directory, "TEXTS", f"{ name }.eo" ), "w" ) as note:
+                note.write( f"panel description for { name }\n" * 200 )
+
+        lines.append( f"project { pages } pages x { page_size // 1024 } KiB ( .kra containers and .png )" )
+        for label, policy in policies:
+            destination = os.path.join( temp, "bench.project_pages.zip" )
+            if os.path.exists( destination ):
+                os.remove( destination )
+            writer = Archive_Incremental( policy )
+            report = writer.Save( directory, destination )
+            size = os.path.getsize( destination ) // 1024
+            lines.append( f"{ label:22s} { report['time']:8.3f} s { size:10d} KiB" )
+
+    for line in lines:
+        print( line )
+    return lines
+def Benchmark_Extract( pages=40, page_size=4*1024*1024 ):
+    """
+    Parallel unpack against shutil.unpack_archive
+    """
+    lines = []
+    with tempfile.TemporaryDirectory() as temp:
+        directory = os.path.join( temp, "bench.temp" )
+        destination = os.path.join( temp, "bench.project_pages.zip" )
+        Benchmark_Project( directory, pages, page_size )
+        Archive_Incremental( Archive_Policy( [], "deflate", 6, False ) ).Save( directory, destination )
+        lines.append( f"project { pages } pages x { page_size // 1024 } KiB ( deflated )" )
+
+        target = os.path.join( temp, "unpack.temp" )
+        start = time.perf_counter()
+        shutil.unpack_archive( destination, target )
+        lines.append( f"unpack_archive        { time.perf_counter() - start:8.3f} s" )
+        shutil.rmtree( target )
+        for workers in [ 1, 2, 4, 8 ]:
+            start = time.perf_counter()
+            Archive_Extract( workers ).Extract( destination, target )
+            lines.append( f"parallel { workers } workers    { time.perf_counter() - start:8.3f} s" )
+            shutil.rmtree( target )
+
+    for line in lines:
+        print( line )
+    return lines
+
+#endregion
+
+
+if __name__ == "__main__":
+    Benchmark_Save()
+    Benchmark_Policy()
+    Benchmark_Extract()
@@ -27,10 +27,20 @@ import pathlib
 import random
 import subprocess
 import datetime
+import time
+import functools
 # Krita Module
 from krita import *
 # PyQt5 Modules
 from PyQt5 import QtWidgets, QtCore, QtGui, uic
+# Plugin Modules
+from .project_pages_archive import *
+from .project_pages_index import *
+from .project_pages_snapshot import *
+from .project_pages_search import *
+from .project_pages_notes import *
+from .project_pages_export import *
+from .project_pages_modulo import *
 
 #endregion
 #region Global Variables
@@ -72,6 +82,9 @@ file_text = [
 
 # Variables
 check_timer = 1000
+save_delay = 2000 # milliseconds to merge a burst of saves
+cache_budget = 64 * 1024 * 1024 # bytes of thumbnails kept on disk
+note_delay = 1500 # milliseconds of idle typing before notes are written
 qt_max = 16777215
 
 # time constants
@@ -134,6 +147,10 @@ class ProjectPages_Docker( DockWidget ):
         # Variables
         self.project_active = False
         self.project_auto_save = False
+        self.project_lazy = False # Open without full unpack
+        self.project_notes = False # Notes in a single database
+        self.export_presets = [ dict( preset_default ) ] # Formats written by Export
+        self.snapshot_limit = 0 # Versions kept on Save ( 0 is off )
         self.thumbnail_size = 100
         self.note_textwrap = False
 
@@ -150,10 +167,51 @@ class ProjectPages_Docker( DockWidget ):
         self.project_trash = None
         self.project_recent = []
 
+        # Archive
+        self.zip_compression = "deflate"
+        self.zip_level = 6
+        self.archive_pool = Archive_Pool( 16, os.name != "nt" ) # Windows can not replace files held open
+        self.archive = Archive_Incremental( Archive_Policy( file_image + file_text, self.zip_compression, self.zip_level ) )
+        self.archive.pool = self.archive_pool
+        self.save_worker = None
+        self.save_pending = False
+        self.save_snapshot = False
+        self.archive_extract = None
+
         # Index
         self.found_images = []
         self.found_texts = []
         self.found_index = { "image" : 0, "text" : 0 }
+        self.content = Index_Content()
+        self.preview = Preview_Registry( self.archive_pool )
+        self.thumbnail_cache = Thumbnail_Cache( os.path.join( self.directory_plugin, "CACHE", "thumbnails" ), cache_budget )
+        self.thumbnail_pool = QtCore.QThreadPool( self )
+        self.thumbnail_signals = Thumbnail_Signals( self )
+        self.thumbnail_jobs = {} # { path : key } waiting for an icon
+        self.project_index = Index_Project()
+        self.page_registry = Page_Registry()
+        self.note_buffer = Note_Buffer( self.File_Text )
+        self.note_store = None
+        self.note_key = None # path of the note file or page name in the database
+        self.export_engine = Export_Engine( transcode=self.Export_Transcode, decode=self.Export_Decode, encode=self.Export_Encode, digest=self.content.Hash )
+        self.export_progress = Export_Progress()
+        self.export_worker = None
+        self.export_run = None # state of the running export
+        self.search = None
+        self.search_mode = None
+        self.search_worker = None
+        self.search_import = None
+        self.page_import = None
+        self.import_worker = None
+        self.project_watcher = QtCore.QFileSystemWatcher( self )
+        self.page_model = Pages_Model( self.thumbnail_cache, self.Thumbnail_Request, parent=self )
+        self.recent_catalog = Recent_Catalog( os.path.join( self.directory_plugin, "CACHE", "recent.json" ) )
+        self.recent_pool = QtCore.QThreadPool( self )
+        self.recent_pool.setMaxThreadCount( 2 ) # gentle with network drives
+        self.recent_signals = Recent_Signals( self )
+        self.recent_jobs = set()
+        self.page_model.placeholder = self.Thumbnail_Placeholder( 100 )
+        self.layout.page_list.setModel( self.page_model )
 
         # Information
         self.work_hours = 0
@@ -222,9 +280,14 @@ class ProjectPages_Docker( DockWidget ):
     def Connections( self ):
         # Panels
         self.layout.project_list.doubleClicked.connect( self.Project_Open )
-        self.layout.page_list.currentItemChanged.connect( self.Text_Load )
+        self.layout.page_list.selectionModel().currentChanged.connect( self.Text_Load )
         self.layout.page_list.doubleClicked.connect( self.Page_Open )
+        self.layout.page_list.verticalScrollBar().valueChanged.connect( self.Thumbnail_Scroll )
+        self.thumbnail_signals.SIGNAL_IMAGE.connect( self.Thumbnail_Done )
+        self.recent_signals.SIGNAL_RECENT.connect( self.Recent_Done )
+        self.project_watcher.directoryChanged.connect( self.Watch_Changed )
         self.layout.text_note.textChanged.connect( self.Text_Save )
+        self.layout.page_filter.textChanged.connect( self.Note_Filter_Request )
         # UI
         self.layout.page_index.valueChanged.connect( self.Index_Number )
         self.layout.settings.clicked.connect( self.Menu_Settings )
@@ -329,14 +392,37 @@ class ProjectPages_Docker( DockWidget ):
         if check_timer >= 30:
             self.timer_pulse = QtCore.QTimer( self )
             self.timer_pulse.timeout.connect( self.Krita_to_ProjectPages )
+        # Save Scheduler
+        self.timer_save = QtCore.QTimer( self )
+        self.timer_save.setSingleShot( True )
+        self.timer_save.timeout.connect( self.Save_Start )
+        # Thumbnails of the rows scrolled into view go first
+        self.timer_thumbnail = QtCore.QTimer( self )
+        self.timer_thumbnail.setSingleShot( True )
+        self.timer_thumbnail.timeout.connect( self.Thumbnail_Queue )
+        # Notes are written after typing stops
+        self.timer_note = QtCore.QTimer( self )
+        self.timer_note.setSingleShot( True )
+        self.timer_note.timeout.connect( self.Note_Flush )
+        # Search starts after typing stops
+        self.timer_filter = QtCore.QTimer( self )
+        self.timer_filter.setSingleShot( True )
+        self.timer_filter.timeout.connect( self.Note_Filter )
+        # Folder changes arrive in bursts
+        self.timer_watch = QtCore.QTimer( self )
+        self.timer_watch.setSingleShot( True )
+        self.timer_watch.timeout.connect( self.Watch_Apply )
     def Settings( self ):
         # Directory Path
         project_recent = self.Set_Read( "EVAL", "project_recent", self.project_recent )
         for i in range( 0, len( project_recent ) ):
             path = project_recent[i]
-            exists = os.path.exists( path )
-            if exists == True:
-                self.project_recent.append( path )
+            if path not in self.project_recent:
+                self.project_recent.append( path ) # existence is checked in the background
+        self.project_lazy = self.Set_Read( "EVAL", "project_lazy", self.project_lazy )
+        self.project_notes = self.Set_Read( "EVAL", "project_notes", self.project_notes )
+        self.export_presets = self.Set_Read( "EVAL", "export_presets", self.export_presets )
+        self.snapshot_limit = self.Set_Read( "EVAL", "snapshot_limit", self.snapshot_limit )
 
         # Note
         self.note_textwrap = self.Set_Read( "EVAL", "note_textwrap", self.note_textwrap )
@@ -416,9 +502,24 @@ class ProjectPages_Docker( DockWidget ):
         action_new = qmenu.addAction( "New" )
         action_import = qmenu.addAction( "Import" )
         action_search = qmenu.addAction( "Search" )
+        if self.search != None:
+            action_search.setText( "Search Cancel" )
+        qmenu.addSeparator()
+        action_lazy = qmenu.addAction( "Lazy Open" )
+        action_lazy.setCheckable( True )
+        action_lazy.setChecked( self.project_lazy )
+        action_notes = qmenu.addAction( "Notes Database" )
+        action_notes.setCheckable( True )
+        action_notes.setChecked( self.project_notes )
+        qmenu_snapshot = qmenu.addMenu( "Snapshots" )
+        action_snapshot_create = qmenu_snapshot.addAction( "Create" )
+        qmenu_snapshot_restore = qmenu_snapshot.addMenu( "Restore" )
+        action_snapshot_prune = qmenu_snapshot.addAction( "Prune" )
+        action_snapshot_limit = qmenu_snapshot.addAction( f"Limit ( { self.snapshot_limit } )" )
         qmenu.addSeparator()
         action_clear = qmenu.addAction( "Clear" )
         action_close = qmenu.addAction( "Close" )
+        action_cancel = qmenu.addAction( "Cancel" )
 
         # Disable
         if ( project_active == True or select_length == 0 ):
@@ -430,11 +531,32 @@ class ProjectPages_Docker( DockWidget ):
         if project_active == True:
             action_new.setEnabled( False )
             action_import.setEnabled( False )
-            action_search.setEnabled( False )
+            action_search.setEnabled( self.search != None )
         if ( project_active == True or select_length == 0 ):
             action_clear.setEnabled( False )
-        if project_active == False:
+        if ( project_active == False or self.export_run != None ):
             action_close.setEnabled( False )
+        # Snapshots of the active project or the selected one
+        snapshot_zip = self.Snapshot_Target()
+        action_snapshot_restore = {}
+        if snapshot_zip == None:
+            action_snapshot_create.setEnabled( False )
+            action_snapshot_prune.setEnabled( False )
+        else:
+            for version in Snapshot_Store( Snapshot_Directory( snapshot_zip ) ).List():
+                date = datetime.datetime.fromtimestamp( version["time"] ).strftime( "%Y-%m-%d %H:%M:%S" )
+                size = round( version["size"] / ( 1024 * 1024 ), 2 )
+                action = qmenu_snapshot_restore.addAction( f"{ version['id'] } | { date } | { version['label'] } | { size } MB" )
+                action_snapshot_restore[action] = version["id"]
+        if ( project_active == True or len( action_snapshot_restore ) == 0 ):
+            qmenu_snapshot_restore.setEnabled( False ) # Restore replaces the ZIP so the project must be closed
+        if ( self.archive_extract == None and self.export_run == None ):
+            action_cancel.setEnabled( False )
+        if self.archive_extract != None:
+            action_open.setEnabled( False )
+            action_new.setEnabled( False )
+            action_import.setEnabled( False )
+            action_clear.setEnabled( False )
 
         #endregion
         #region Actions
@@ -458,11 +580,28 @@ class ProjectPages_Docker( DockWidget ):
         if action == action_import:
             self.Project_Import()
         if action == action_search:
-            self.Project_Search()
+            if self.search != None:
+                self.Search_Cancel()
+            else:
+                self.Project_Search()
+        if action == action_lazy:
+            self.Project_Lazy( action_lazy.isChecked() )
+        if action == action_notes:
+            self.Project_Notes( action_notes.isChecked() )
+        if action == action_snapshot_create:
+            self.Snapshot_Create( snapshot_zip )
+        if action in action_snapshot_restore:
+            self.Snapshot_Restore( snapshot_zip, action_snapshot_restore[action] )
+        if action == action_snapshot_prune:
+            self.Snapshot_Prune( snapshot_zip )
+        if action == action_snapshot_limit:
+            self.Snapshot_Limit()
         if action == action_clear:
             self.Project_Recent_Clear( select_item[0] )
         if action == action_close:
             self.ZIP_Close()
+        if action == action_cancel:
+            self.ZIP_Cancel()
 
         #endregion
     def Menu_PageContext( self, event ):
@@ -470,10 +609,8 @@ class ProjectPages_Docker( DockWidget ):
             #region Variable
 
             # Selected Items
-            select_item = self.layout.page_list.selectedItems()
+            select_item = self.Page_Selected()
             select_length = len( select_item )
-            for i in range( 0, select_length ):
-                select_item[i] = select_item[i].text()
             # All Items are Closed Check
             closed = self.Items_Closed()
 
@@ -487,9 +624,15 @@ class ProjectPages_Docker( DockWidget ):
             action_new = qmenu.addAction( "New" )
             action_import = qmenu.addAction( "Import" )
             action_search = qmenu.addAction( "Search" )
+            if self.search != None:
+                action_search.setText( "Search Cancel" )
             menu_batch = qmenu.addMenu( "Batch" )
             action_rename = menu_batch.addAction( "Rename" )
             action_export = menu_batch.addAction( "Export" )
+            action_export_plan = menu_batch.addAction( "Export Plan" )
+            action_export_presets = menu_batch.addAction( f"Export Presets ( { len( self.export_presets ) } )" )
+            action_export_cancel = qmenu.addAction( "Export Cancel" )
+            action_export_cancel.setVisible( self.export_run != None )
             action_thumbnail = qmenu.addAction( "Thumbnail" )
             action_trash = qmenu.addAction( "Trash" )
 
@@ -500,9 +643,16 @@ class ProjectPages_Docker( DockWidget ):
                 menu_batch.setEnabled( False )
                 action_rename.setEnabled( False )
                 action_export.setEnabled( False )
+                action_export_plan.setEnabled( False )
             if select_length == 0:
                 action_thumbnail.setEnabled( False )
                 action_trash.setEnabled( False )
+            if self.export_run != None:
+                action_open.setEnabled( False )
+                action_new.setEnabled( False )
+                action_import.setEnabled( False )
+                menu_batch.setEnabled( False )
+                action_trash.setEnabled( False )
 
             #endregion
             #region Action
@@ -519,11 +669,20 @@ class ProjectPages_Docker( DockWidget ):
             if action == action_import:
                 self.Page_Import()
             if action == action_search:
-                self.Page_Search()
+                if self.search != None:
+                    self.Search_Cancel()
+                else:
+                    self.Page_Search()
             if action == action_rename:
                 self.Page_Rename()
             if action == action_export:
                 self.Page_Export()
+            if action == action_export_plan:
+                self.Page_Export( True )
+            if action == action_export_presets:
+                self.Export_Presets()
+            if action == action_export_cancel:
+                self.Export_Cancel()
             if action == action_thumbnail:
                 self.Page_Project_Thumbnail( select_item[0] )
             if action == action_trash:
@@ -743,32 +902,16 @@ class ProjectPages_Docker( DockWidget ):
     def Check_Active( self ):
         check = False
         if ( ( self.canvas() is not None ) and ( self.canvas().view() is not None ) ):
-            active = os.path.normpath( Krita.instance().activeDocument().fileName() )
-            for i in range( 0, len( self.found_images ) ): # Project Pages Open
-                page_i = os.path.normpath( self.found_images[i] )
-                if active == page_i:
-                    check = True
-                    break
+            active = Krita.instance().activeDocument().fileName()
+            check = self.page_registry.Page_Path( active ) != None # Project Pages Open
         return check
     def Check_Documents( self ):
-        check = True
         documents = Krita.instance().documents()
-        for d in range( 0, len( documents ) ):
-            doc_d = os.path.normpath( documents[d].fileName() )
-            for i in range( 0, len( self.found_images ) ): # Project Pages Open
-                page_i = os.path.normpath( self.found_images[i] )
-                if doc_d == page_i:
-                    check = False
-                    break
-        return check
+        opened = self.page_registry.Documents( [ d.fileName() for d in documents ] ) # Project Pages Open
+        return len( opened ) == 0
 
     def Items_All( self ):
-        count = self.layout.page_list.count()
-        all_items = []
-        for i in range( 0, count ):
-            item = self.layout.page_list.item( i ).text()
-            all_items.append( item )
-        return all_items
+        return self.page_model.Names()
 
     def Read_Nodes( self, document ):
         # Document
@@ -841,24 +984,11 @@ class ProjectPages_Docker( DockWidget ):
 
         # Documents Read
         documents = Krita.instance().documents()
-        doc_list = []
         for d in range( 0, len( documents ) ):
             name = os.path.basename( documents[d].fileName() )
-            doc_list.append( name )
-        # All Items Read
-        count = self.layout.page_list.count()
-        all_items = []
-        for i in range( 0, count ):
-            item = self.layout.page_list.item( i ).text()
-            all_items.append( item )
-
-        # Check
-        closed = True
-        for i in range( 0, len( doc_list ) ):
-            for j in range( 0, len( all_items ) ):
-                if doc_list[i] == all_items[j]:
-                    closed = False
-                    break
+            if self.page_registry.Page( name ) != None:
+                closed = False
+                break
         return closed
 
     def string_lista( self, string ):
@@ -986,33 +1116,31 @@ class ProjectPages_Docker( DockWidget ):
         self.layout.page_index.blockSignals( False )
     def Index_Number( self, index ):
         # Widgets
-        self.layout.page_list.setCurrentRow( index - 1 )
+        self.Page_Row_Set( index - 1 )
         # Update Index
         self.Index_Set()
     def Index_Set( self ):
         check_image = len( self.found_images )
         check_text = len( self.found_texts )
-        item = self.layout.page_list.currentItem()
-        if ( item != None and check_image > 0 and check_text > 0 ):
-            text = item.text()
-            image_name = text.split( "." )[0]
-
-            # Search Matching Files
-            for i in range( 0, len( self.found_texts ) ):
-                path = self.found_texts[i]
-                name = self.Path_Components( self.found_texts[i] )
-                if image_name == name:
-                    # Index
-                    self.found_index["image"] = self.layout.page_list.currentRow() # Widget index
-                    self.found_index["text"] = i # file index
-                    # Read Text
-                    with open( path, "r" ) as note:
-                        data = note.read()
-                        note.close()
-                        # Widget
-                        self.layout.text_note.clear()
-                        self.layout.text_note.setText( str( data ) )
-                        break
+        text = self.Page_Current()
+        database = self.note_store != None
+        if ( text != None and check_image > 0 and ( check_text > 0 or database == True ) ):
+            # Matching Files
+            record = self.page_registry.Page( text )
+            if ( record != None and ( record.text != None or database == True ) ):
+                # Previous note is written before switching
+                self.Note_Flush()
+                # Index
+                self.found_index["image"] = self.Page_Row() # Widget index
+                self.found_index["text"] = record.text_index # file index
+                self.note_key = record.name if database == True else record.text
+                # Read Text
+                data = self.note_buffer.Read( self.note_key )
+                # Widget ( no textChanged, the note did not change )
+                self.layout.text_note.blockSignals( True )
+                self.layout.text_note.clear()
+                self.layout.text_note.setText( str( data ) )
+                self.layout.text_note.blockSignals( False )
 
     #endregion
     #region Panels
@@ -1029,12 +1157,102 @@ class ProjectPages_Docker( DockWidget ):
             self.layout.page_index.setSuffix( total )
             self.layout.page_index.blockSignals( False )
     def Text_Save( self ):
-        if ( self.project_active == True and len( self.found_texts ) > 0 ):
+        if ( self.project_active == True and self.note_key != None ):
             text_block = self.layout.text_note.toPlainText()
-            file_txt = self.found_texts[ self.found_index["text"] ]
-            note = open( file_txt, "w" )
-            note.write( text_block )
-            note.close()
+            if self.note_buffer.Write( self.note_key, text_block ) == True:
+                self.timer_note.start( note_delay )
+    def Note_Flush( self, wait=False ):
+        self.timer_note.stop()
+        # The save worker may be reading the database
+        if ( self.note_store != None and self.save_worker != None and self.save_worker.isRunning() == True ):
+            if wait == False:
+                self.timer_note.start( note_delay )
+                return
+            self.save_worker.wait()
+        try:
+            count = self.note_buffer.Flush()
+        except Exception as e:
+            self.Message_Log( "NOTE", f"flush { e }" ) # notes stay dirty and are written by the next flush
+            count = 0
+        if count > 0:
+            stats = self.note_buffer.Stats()
+            self.Message_Log( "NOTE", f"flush { count } notes in { round( stats['time_last'] * 1000, 2 ) }ms | flushes { stats['flushes'] } writes { stats['writes'] } average { round( stats['time_average'] * 1000, 2 ) }ms" )
+    def Note_Open( self ):
+        # Notes in a single database when enabled
+        self.Note_Close()
+        if ( self.project_active == True and self.project_notes == True ):
+            path = os.path.normpath( os.path.join( self.project_directory, note_database ) )
+            try:
+                self.note_store = Note_Store( path )
+            except Exception as e:
+                self.Message_Warnning( "ERROR", f"Notes\n{ e }" )
+                return
+            # Migration of the note files
+            texts = { os.path.splitext( os.path.basename( p ) )[0] : p for p in self.found_texts }
+            count = self.note_store.Migrate( texts, self.File_Text )
+            if count > 0:
+                self.Message_Log( "NOTE", f"migrated { count } notes" )
+            self.note_buffer = Note_Buffer( self.Note_Read, self.note_store.Set_Many )
+    def Note_Close( self ):
+        if self.note_store != None:
+            self.note_store.Close()
+            self.note_store = None
+        self.note_buffer = Note_Buffer( self.File_Text )
+        self.note_key = None
+    def Note_Read( self, page ):
+        text = self.note_store.Get( page )
+        return "" if text == None else text
+    def Note_Export( self ):
+        # Database notes back to the note files ( pages without one get a new file )
+        if self.note_store != None:
+            files = Note_Buffer( self.File_Text )
+            for record in self.page_registry.pages.values():
+                text = self.note_store.Get( record.name )
+                if text == None:
+                    continue
+                if record.text != None:
+                    path = record.text
+                    self.File_Extract( path )
+                else:
+                    path = os.path.normpath( os.path.join( self.project_texts, f"{ record.name }.eo" ) )
+                files.Write( path, text )
+            files.Flush()
+    def Note_Rename( self, old, new ):
+        # The note follows its page, a note left under the new name belongs to no page
+        if self.note_store != None:
+            if self.note_store.Rename( old, new ) == False:
+                self.Message_Log( "NOTES", f"replaced the note left under { new }" )
+                self.note_store.Rename( old, new, True )
+    def Note_Filter_Request( self, text ):
+        self.timer_filter.start( 250 )
+    def Note_Filter( self ):
+        if self.project_active == True:
+            text = self.layout.page_filter.text()
+            pages = self.Note_Search( text )
+            paths = []
+            for page in pages:
+                record = self.page_registry.Page_Name( page )
+                if record != None:
+                    paths.append( record.image )
+            self.page_model.Highlight_Set( paths )
+            # First match in page order
+            rows = [ r for r in ( self.page_model.Row( p ) for p in paths ) if r >= 0 ]
+            if len( rows ) > 0:
+                self.Page_Row_Set( min( rows ) )
+    def Note_Search( self, text ):
+        words = text.lower().split()
+        if len( words ) == 0:
+            return []
+        self.Note_Flush()
+        if self.note_store != None:
+            return self.note_store.Search( text )
+        # Note files read through the buffer
+        pages = []
+        for path in self.found_texts:
+            note = self.note_buffer.Read( path ).lower()
+            if all( w in note for w in words ):
+                pages.append( os.path.splitext( os.path.basename( path ) )[0] )
+        return pages
 
     #endregion
     #region Project
@@ -1065,6 +1283,21 @@ class ProjectPages_Docker( DockWidget ):
         if ( path != "" and path != "." ):
             self.File_Search( path, "PROJECT" )
 
+    def Project_Lazy( self, boolean ):
+        self.project_lazy = boolean
+        Krita.instance().writeSetting( DOCKER_NAME, "project_lazy", str( self.project_lazy ) )
+    def Project_Notes( self, boolean ):
+        self.project_notes = boolean
+        Krita.instance().writeSetting( DOCKER_NAME, "project_notes", str( self.project_notes ) )
+        # Active Project changes store right away
+        if self.project_active == True:
+            self.Note_Flush( True )
+            if boolean == False:
+                self.Note_Export()
+                self.Page_Update( [ "TEXTS" ] )
+            self.Note_Open()
+            self.Index_Set()
+
     def Project_Recent_Add( self, path ):
         # List Limit
         limit = 100
@@ -1076,15 +1309,16 @@ class ProjectPages_Docker( DockWidget ):
             self.project_recent.remove( path )
         self.project_recent.insert( 0, path )
         # Update
-        self.Project_Thumbnail( self.project_recent )
+        self.Project_Thumbnail( self.project_recent, [ path ] )
         Krita.instance().writeSetting( DOCKER_NAME, "project_recent", str( self.project_recent ) )
     def Project_Recent_Minus( self, path ):
         # Minus from List
         if path in self.project_recent:
             index = self.project_recent.index( path )
             self.project_recent.pop( index )
+        self.recent_catalog.Remove( path )
         # Update
-        self.Project_Thumbnail( self.project_recent )
+        self.Project_Thumbnail( self.project_recent, [] )
         Krita.instance().writeSetting( DOCKER_NAME, "project_recent", str( self.project_recent ) )
     def Project_Recent_Clear( self, project_item ):
         for i in range( 0, len( self.project_recent ) ):
@@ -1093,47 +1327,71 @@ class ProjectPages_Docker( DockWidget ):
                 path = self.project_recent[i]
                 self.Project_Recent_Minus( path )
                 break
-        self.Project_Thumbnail( self.project_recent )
-        Krita.instance().writeSetting( DOCKER_NAME, "project_recent", str( self.project_recent ) )
 
-    def Project_Thumbnail( self, project_recent ):
-        # Clean Previous
-        self.layout.project_list.clear()
-
-        # Items
-        for i in range( 0, len( project_recent ) ):
-            # Variables
-            path = project_recent[i]
-            basename = os.path.basename( path ).replace( ".project_pages.zip", "" )
-            # Create Items
-            item = QListWidgetItem( basename )
-            size = 100
-            # Thumbnail
-            bg = QPixmap( size, size )
+    def Project_Thumbnail( self, project_recent, refresh=None ):
+        # Items follow the list with icons from the catalog, only what differs is touched
+        view = self.layout.project_list
+        items = {}
+        for row in range( view.count() - 1, -1, -1 ):
+            item = view.item( row )
+            path = item.data( Qt.UserRole )
+            if ( path in project_recent and path not in items ):
+                items[path] = item
+            else:
+                view.takeItem( row )
+        for row in range( 0, len( project_recent ) ):
+            path = project_recent[row]
+            item = items.get( path, None )
+            if item == None:
+                item = QListWidgetItem( os.path.basename( path ).replace( ".project_pages.zip", "" ) )
+                item.setData( Qt.UserRole, path )
+                item.setIcon( self.Recent_Icon( path ) )
+                view.insertItem( row, item )
+            elif view.row( item ) != row:
+                view.takeItem( view.row( item ) )
+                view.insertItem( row, item )
+
+        # Existence and thumbnails are checked in the background
+        self.Recent_Refresh( project_recent if refresh == None else refresh )
+    def Recent_Icon( self, path ):
+        key = self.recent_catalog.Get( path )
+        qimage = self.thumbnail_cache.Get( key ) if key != None else None
+        if qimage == None:
+            bg = QPixmap( 100, 100 )
             bg.fill( self.color_alpha )
-            # Zip File Thumbnail
-            if zipfile.is_zipfile( path ):
-                name = "thumbnail.png"
-                archive = zipfile.ZipFile( path, "r" )
-                data = archive.open( name ).read()
-                qpixmap = QPixmap()
-                qpixmap.loadFromData( data )
-                if qpixmap.isNull() == False:
-                    # Scale
-                    pix = qpixmap.scaled( size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation )
-                    # Variable
-                    w = pix.width()
-                    h = pix.height()
-                    px = int( ( size*0.5 ) - ( w*0.5 ) )
-                    py = int( ( size*0.5 ) - ( h*0.5 ) )
-                    # Composed Image
-                    painter = QPainter( bg )
-                    painter.drawPixmap( px, py, pix )
-                    painter.end()
-                    # Item
-                    qicon = QIcon( bg )
-                    item.setIcon( qicon )
-                    self.layout.project_list.addItem( item )
+            return QIcon( bg )
+        return QIcon( QPixmap.fromImage( qimage ) )
+    def Recent_Refresh( self, lista ):
+        for path in lista:
+            if path not in self.recent_jobs:
+                self.recent_jobs.add( path )
+                job = Recent_Job( self.recent_signals, path, self.recent_catalog.Get( path ), 100, self.color_alpha, self.thumbnail_cache, self.archive_pool )
+                self.recent_pool.start( job )
+        if len( self.recent_jobs ) == 0:
+            self.recent_catalog.Flush()
+    def Recent_Done( self, path, exists, key, qimage ):
+        self.recent_jobs.discard( path )
+        self.Recent_Apply( path, exists, key, qimage )
+        # Catalog written once after the last job
+        if len( self.recent_jobs ) == 0:
+            self.recent_catalog.Flush()
+    def Recent_Apply( self, path, exists, key, qimage ):
+        if path not in self.project_recent:
+            return
+        if exists == False:
+            if path != self.project_zip:
+                self.Project_Recent_Minus( path )
+            return
+        if qimage.isNull() == True:
+            return # icon drawn is still current
+        # Only the item that changed
+        self.recent_catalog.Set( path, key )
+        view = self.layout.project_list
+        for row in range( 0, view.count() ):
+            item = view.item( row )
+            if item.data( Qt.UserRole ) == path:
+                item.setIcon( QIcon( QPixmap.fromImage( qimage ) ) )
+                break
 
     #endregion
     #region ZIP operations
@@ -1173,7 +1431,10 @@ class ProjectPages_Docker( DockWidget ):
                 qimage.save( self.project_thumbnail )
 
                 # Create File ZIP
-                shutil.make_archive( self.project_directory, 'zip', self.project_directory ) # Creates the ZIP
+                self.Archive_Compression( self.zip_compression, self.zip_level )
+                self.archive.Save( self.project_directory, self.project_zip )
+                self.archive.Signature_Reset( self.project_directory )
+                self.Watch_Start()
 
                 # Update
                 project_displayname = os.path.basename( self.project_zip )
@@ -1181,12 +1442,14 @@ class ProjectPages_Docker( DockWidget ):
                 self.dialog.label_project_active.setText( project_displayname )
                 self.project_active = True
                 self.File_List()
+                self.Note_Open()
 
                 # Thumbnails
                 self.Project_Thumbnail( self.project_recent )
 
                 # Widgets
                 self.layout.page_list.setEnabled( True )
+                self.layout.page_filter.setEnabled( True )
                 self.layout.text_note.setEnabled( True )
 
                 # Control
@@ -1211,22 +1474,23 @@ class ProjectPages_Docker( DockWidget ):
                 # Check if it is a valid Project_Pages ZIP file
                 valid = False
                 if zipfile.is_zipfile( project_zip ):
-                    # Open Zip
-                    archive = zipfile.ZipFile( project_zip, "r" )
-                    name_list = archive.namelist()
+                    # Open Zip ( names come from the central directory already read )
+                    with zipfile.ZipFile( project_zip, "r" ) as archive:
+                        name_list = set( archive.namelist() )
                     # Structure Verification
-                    check_structure = False
-                    item = 0
-                    for i in range( 0, len( structure ) ):
-                        if structure[i] in name_list:
-                            item += 1
-                    check_structure = item == len( structure )
+                    check_structure = all( s in name_list for s in structure )
                     # Valid
                     if check_structure == True:
                         valid = True
 
+                # Full Unpack ( before the project is active so nothing saves a partial folder )
+                lazy = self.project_lazy
+                extracted = True
+                if ( valid == True and lazy == False ):
+                    extracted = self.ZIP_Extract( project_zip, project_directory )
+
                 # Open the Valid ZIP file
-                if valid == True:
+                if ( valid == True and extracted == True ):
                     # Recent Projects
                     self.Project_Recent_Add( project_zip )
 
@@ -1245,11 +1509,16 @@ class ProjectPages_Docker( DockWidget ):
                     self.dialog.label_project_active.setText( basename )
 
                     # Unzip Project
-                    shutil.unpack_archive( self.project_zip, self.project_directory )
+                    if lazy == True:
+                        self.archive.Lazy_Open( self.project_zip, self.project_directory ) # Pages are extracted on demand
+                    else:
+                        self.archive.Signature_Reset( self.project_directory )
+                    self.Watch_Start()
 
                     # Update
                     self.File_List()
                     self.Index_Range( self.found_images, self.found_texts )
+                    self.Note_Open()
 
                     # Control
                     self.Control_Load()
@@ -1259,20 +1528,56 @@ class ProjectPages_Docker( DockWidget ):
 
                     # Widgets
                     self.layout.page_list.setEnabled( True )
+                    self.layout.page_filter.setEnabled( True )
                     self.layout.text_note.setEnabled( True )
+                elif valid == True:
+                    self.Message_Log( "OPEN", f"Cancelled { basename }" )
                 else:
                     self.Project_Recent_Minus( project_zip )
                     self.Message_Warnning( "ERROR", "Invalid File\nSuggestion : Import files into a new project" )
             else:
                 self.File_Conflict( project_directory )
+    def ZIP_Extract( self, project_zip, project_directory ):
+        # Parallel Unpack
+        self.archive_extract = Archive_Extract()
+        try:
+            completed = self.archive_extract.Extract( project_zip, project_directory, self.Extract_Progress )
+        except Exception as e:
+            completed = False
+            self.Message_Warnning( "ERROR", f"Unpack\n{ e }" )
+        self.archive_extract = None
+        # Progress Bar
+        self.layout.progress_bar.setValue( 0 )
+        return completed
+    def Extract_Progress( self, done, total ):
+        self.layout.progress_bar.setMaximum( 1000 )
+        self.layout.progress_bar.setValue( int( 1000 * done / max( total, 1 ) ) )
+        QApplication.processEvents() # Cancel stays reachable
+    def ZIP_Cancel( self ):
+        if self.archive_extract != None:
+            self.archive_extract.Cancel()
+        self.Search_Cancel()
+        self.Import_Cancel()
+        self.export_engine.Cancel()
     def ZIP_Save( self ):
         if self.project_active == True:
-            destination = self.project_zip.replace( ".zip", "" ) # Zip is added with the archive format
-            shutil.make_archive( destination, 'zip', self.project_directory )
-            self.File_List()
-            self.Message_Float( "SAVE", "Complete", "document-save" )
+            self.Save_Request( 0, self.snapshot_limit > 0 )
     def ZIP_Close( self ):
         if self.project_active == True:
+            # Pending Saves
+            self.Note_Flush( True )
+            self.Note_Close()
+            self.Save_Flush()
+            self.Thumbnail_Cancel()
+            self.Search_Cancel()
+            if self.search_worker != None:
+                self.search_worker.wait() # no copy left writing into the folder
+            self.Import_Cancel()
+            if self.import_worker != None:
+                self.import_worker.wait()
+            self.Watch_Stop()
+            self.page_registry.Clear()
+
             # Ask user if Project Folder should be deleted
             string = "Delete Temporary Project Folder ?\n\nThis will not affect your project ZIP file\n"
             boolean = QMessageBox.question( self, DOCKER_NAME, string, QMessageBox.Yes, QMessageBox.No )
@@ -1281,6 +1586,9 @@ class ProjectPages_Docker( DockWidget ):
 
             # Update variables
             self.project_active = False
+            self.archive.Signature_Clear()
+            self.archive_pool.Close( self.project_zip )
+            self.content.Clear()
             self.project_zip = None
             self.project_directory = None
             self.project_control = None
@@ -1291,7 +1599,7 @@ class ProjectPages_Docker( DockWidget ):
             self.found_texts = []
 
             # Update widgets
-            self.layout.page_list.clear()
+            self.page_model.Clear()
             self.layout.text_note.clear()
             self.Index_Range( self.found_images, self.found_texts )
             # Text Display
@@ -1299,34 +1607,145 @@ class ProjectPages_Docker( DockWidget ):
             self.dialog.label_project_active.setText( "" )
             # Enabled
             self.layout.page_list.setEnabled( False )
+            self.layout.page_filter.setEnabled( False )
+            self.layout.page_filter.blockSignals( True )
+            self.layout.page_filter.clear()
+            self.layout.page_filter.blockSignals( False )
             self.layout.text_note.setEnabled( False )
     def ZIP_Exit( self, project_directory ):
         if ( self.project_active == True and os.path.isdir( project_directory ) == True ):
+            self.Save_Flush()
             try:shutil.rmtree( project_directory )
             except:pass
 
+    # Compression
+    def Archive_Compression( self, method, level ):
+        self.zip_compression = method
+        self.zip_level = level
+        self.archive.policy = Archive_Policy( file_image + file_text, self.zip_compression, self.zip_level )
+
+    # Save Scheduler
+    def Save_Request( self, delay, snapshot=False ):
+        # Restarting the timer merges requests into one save
+        self.save_pending = True
+        self.save_snapshot = self.save_snapshot or snapshot
+        self.timer_save.start( delay )
+    def Save_Start( self ):
+        if ( self.project_active == True and self.save_pending == True ):
+            # Busy ( Save_Finish starts the next one )
+            if ( self.save_worker != None and self.save_worker.isRunning() == True ):
+                return
+            # Worker
+            self.save_pending = False
+            self.Note_Flush()
+            snapshot = self.Snapshot_Save()
+            self.save_worker = Worker_Save( self.archive, self.project_directory, self.project_zip, snapshot )
+            self.save_worker.SIGNAL_PROGRESS.connect( self.Save_Progress )
+            self.save_worker.SIGNAL_FINISH.connect( self.Save_Finish )
+            self.save_worker.start()
+    def Save_Progress( self, index, total ):
+        self.layout.progress_bar.setMaximum( total )
+        self.layout.progress_bar.setValue( index )
+    def Save_Finish( self, report ):
+        # Progress Bar
+        self.layout.progress_bar.setValue( 0 )
+
+        # Report
+        if "error" in report:
+            self.Message_Warnning( "ERROR", f"Save\n{ report['error'] }" )
+        elif self.project_active == True:
+            self.Message_Log( "SAVE", f"copied { report['copied'] } compressed { report['compressed'] } in { round( report['time'], 3 ) }s" )
+            if "snapshot" in report:
+                self.Snapshot_Report( report["snapshot"] )
+            self.File_List()
+            if "thumbnail.png" in report["changed"]:
+                self.Project_Thumbnail( self.project_recent )
+            self.Message_Float( "SAVE", "Complete", "document-save" )
+
+        # Requests made while saving
+        if self.save_pending == True:
+            self.timer_save.start( 0 )
+    def Save_Flush( self ):
+        # Finish all saves before the project folder goes away
+        self.timer_save.stop()
+        if self.save_worker != None:
+            self.save_worker.wait()
+        if ( self.save_pending == True and self.project_active == True ):
+            self.save_pending = False
+            self.Note_Flush()
+            snapshot = self.Snapshot_Save()
+            self.archive.Save( self.project_directory, self.project_zip )
+            if snapshot != None:
+                self.Snapshot_Report( snapshot.Snapshot( self.project_zip, "save" ) )
+
+    # Snapshots
+    def Snapshot_Target( self ):
+        if self.project_active == True:
+            return self.project_zip
+        index = self.layout.project_list.currentRow()
+        if ( len( self.layout.project_list.selectedItems() ) > 0 and 0 <= index < len( self.project_recent ) ):
+            return self.project_recent[index]
+        return None
+    def Snapshot_Save( self ):
+        # Store for the save being started, if one was asked
+        snapshot = None
+        if ( self.save_snapshot == True and self.project_zip != None ):
+            snapshot = Snapshot_Store( Snapshot_Directory( self.project_zip ), self.snapshot_limit )
+        self.save_snapshot = False
+        return snapshot
+    def Snapshot_Report( self, report ):
+        if "error" in report:
+            self.Message_Warnning( "ERROR", f"Snapshot\n{ report['error'] }" )
+        else:
+            stored = round( report["stored"] / ( 1024 * 1024 ), 2 )
+            self.Message_Log( "SNAPSHOT", f"{ report['id'] } stored { stored } MB freed { report['freed'] } bytes in { round( report['time'], 3 ) }s" )
+    def Snapshot_Create( self, project_zip ):
+        if ( self.project_active == True and project_zip == self.project_zip ):
+            self.Save_Request( 0, True ) # Snapshot of what is on screen
+        elif os.path.isfile( project_zip ) == True:
+            store = Snapshot_Store( Snapshot_Directory( project_zip ), max( self.snapshot_limit, 0 ) )
+            try:self.Snapshot_Report( store.Snapshot( project_zip, "manual" ) )
+            except Exception as e:self.Snapshot_Report( { "error" : str( e ) } )
+    def Snapshot_Restore( self, project_zip, number ):
+        if self.project_active == False:
+            string = f"Restore snapshot { number } ?\n\nThe current ZIP file is kept as a new snapshot first\n"
+            boolean = QMessageBox.question( self, DOCKER_NAME, string, QMessageBox.Yes, QMessageBox.No )
+            if boolean == QMessageBox.Yes:
+                store = Snapshot_Store( Snapshot_Directory( project_zip ), 0 ) # nothing is pruned while restoring
+                try:
+                    if os.path.isfile( project_zip ) == True:
+                        store.Snapshot( project_zip, f"before restore { number }" )
+                    store.Restore( number, project_zip, self.archive_pool.Replace )
+                    self.Project_Thumbnail( self.project_recent )
+                    self.Message_Log( "SNAPSHOT", f"restored { number } into { project_zip }" )
+                except Exception as e:
+                    self.Message_Warnning( "ERROR", f"Restore\n{ e }" )
+    def Snapshot_Prune( self, project_zip ):
+        self.Save_Flush() # the save worker may be writing a snapshot
+        store = Snapshot_Store( Snapshot_Directory( project_zip ) )
+        freed = store.Prune( max( self.snapshot_limit, 1 ) )
+        self.Message_Log( "SNAPSHOT", f"prune { project_zip } freed { freed } bytes" )
+    def Snapshot_Limit( self ):
+        number, ok = QInputDialog.getInt( self, DOCKER_NAME, "Snapshots kept ( 0 is off )", self.snapshot_limit, 0, 1000 )
+        if ok == True:
+            self.snapshot_limit = number
+            Krita.instance().writeSetting( DOCKER_NAME, "snapshot_limit", str( self.snapshot_limit ) )
+
     #endregion
     #region Pages
 
     def Page_New( self ):
         if self.project_active == True:
-            # Taken Names
-            taken_names = []
-            count = self.layout.page_list.count()
-            for i in range( 0, count ):
-                text = self.layout.page_list.item( i ).text()
-                taken_names.append( text )
-
             # Check with Taken Names
             limit = len( self.found_images ) + 10
             for i in range( 1, limit ):
                 name = self.doc_basename + "_" + str( i ).zfill( 4 )
                 check_name = name + ".kra"
-                if check_name not in taken_names:
-                    # Paths
-                    file_img = os.path.normpath( os.path.join( self.project_images, f"{ name }.kra" ) )
-                    file_txt = os.path.normpath( os.path.join( self.project_texts, f"{ name }.eo" ) )
-
+                # Paths
+                file_img = os.path.normpath( os.path.join( self.project_images, check_name ) )
+                file_txt = os.path.normpath( os.path.join( self.project_texts, f"{ name }.eo" ) )
+                taken = ( os.path.exists( file_img ) or os.path.exists( file_txt ) )
+                if ( self.page_registry.Page( check_name ) == None and taken == False ):
                     # Texts
                     note = open( file_txt, "w" )
                     note.write( "" )
@@ -1351,7 +1770,7 @@ class ProjectPages_Docker( DockWidget ):
                     break
 
         # Update
-        self.Page_Update()
+        self.Page_Update( [ "IMAGES", "TEXTS" ] )
     def Page_Import( self ):
         if self.project_active == True:
             # Extensions to Search
@@ -1368,19 +1787,61 @@ class ProjectPages_Docker( DockWidget ):
             file_dialog.setFileMode( QFileDialog.AnyFile )
             source = file_dialog.getOpenFileNames( self, "Select Files", "", filter_images )
             source = list( source[0] )
-            for item in source:
-                if ( item != "" and item != "." and item not in self.found_images ):
-                    self.Page_Source( item )
+            source = [ item for item in source if ( item != "" and item != "." and item not in self.found_images ) ]
+            self.Page_Import_Sources( source )
+    def Page_Import_Sources( self, source ):
+        # Duplicates are skipped and pages copied by a worker ( the panel is updated on finish )
+        if ( len( source ) == 0 or self.import_worker != None ):
+            return
+        opener = functools.partial( Member_Open, self.archive_pool, self.project_zip, self.project_directory )
+        self.page_import = Search_Import( self.project_images, self.content, self.Import_Existing(), opener )
+        self.import_worker = Worker_Import( self.page_import, source, parent=self )
+        self.import_worker.SIGNAL_PROGRESS.connect( self.Import_Progress )
+        self.import_worker.SIGNAL_FINISH.connect( self.Import_Finish )
+        self.import_worker.start()
+    def Import_Cancel( self ):
+        if self.page_import != None:
+            self.page_import.Cancel()
+    def Import_Finish( self, report ):
+        # Worker
+        self.import_worker.wait()
+        self.import_worker.deleteLater()
+        self.import_worker = None
+        self.page_import = None
+        # Progress Bar
+        self.layout.progress_bar.setMaximum( 1 )
+        self.layout.progress_bar.setValue( 0 )
         # Update
-        self.Page_Update()
-    def Page_Source( self, source ):
-        # Variables
-        destination = self.project_images
-        # Copy Image
-        shutil.copy( source, destination )
-        # Create Text
+        if self.project_active == True:
+            self.Import_Report( report["copied"], report["failed"], report["duplicates"], report["bytes_saved"] )
+            self.Page_Update( [ "IMAGES", "TEXTS" ] )
+    def Import_Existing( self ):
+        # { path : size } of the project pages
+        existing = {}
+        for path in self.found_images:
+            size = self.File_Size( path )
+            if size != None:
+                existing[path] = size
+        return existing
+    def Import_Report( self, copied, failed, duplicates, bytes_saved ):
+        for item, target in copied:
+            self.Page_Text( target )
+        for item, error in failed:
+            self.Message_Log( "IMPORT", f"failed { item } { error }" )
+        for item, original in duplicates:
+            self.Message_Log( "IMPORT", f"duplicate { item } = { os.path.basename( original ) }" )
+        if len( duplicates ) > 0:
+            saved = round( bytes_saved / ( 1024 * 1024 ), 2 )
+            self.Message_Float( "IMPORT", f"{ len( duplicates ) } Duplicates skipped ( { saved } MB saved )", "document-import" )
+    def Import_Progress( self, index, total ):
+        self.layout.progress_bar.setMaximum( total )
+        self.layout.progress_bar.setValue( index )
+    def Page_Text( self, source ):
+        # Empty note of a page
         name = self.Path_Components( source )
         file_txt = os.path.normpath( os.path.join( self.project_texts, f"{ name }.eo" ) )
+        if os.path.exists( file_txt ) == True:
+            return # a note left by an older page is kept
         note = open( file_txt, "w" )
         note.write( "" )
         note.close()
@@ -1394,8 +1855,11 @@ class ProjectPages_Docker( DockWidget ):
     def Page_Open( self ):
         if self.project_active == True:
             # Item
-            basename = self.layout.page_list.currentItem().text()
+            basename = self.Page_Current()
+            if basename == None:
+                return
             path = os.path.normpath( os.path.join( self.project_images, basename ) )
+            self.File_Extract( path )
 
             # Create Document
             document = Krita.instance().openDocument( path )
@@ -1413,6 +1877,7 @@ class ProjectPages_Docker( DockWidget ):
                 document.setFullClipRangeEndTime( 0 )
     def Page_Rename( self ):
         if self.project_active == True:
+            self.Note_Flush( True )
             # Dialog
             name, boolean = QtWidgets.QInputDialog.getText( self, DOCKER_NAME, "Rename As" )
             new_name = name.replace( " ", "_" )
@@ -1439,12 +1904,17 @@ class ProjectPages_Docker( DockWidget ):
                         new_image  = os.path.normpath( os.path.join( self.project_images, f"{ new_name }_{ num }.{ image_ext }" ) )
                         new_backup = os.path.normpath( os.path.join( self.project_images, f"{ new_name }_{ num }.{ image_ext }~" ) )
                         new_text   = os.path.normpath( os.path.join( self.project_texts,  f"{ new_name }_{ num }.eo" ) )
+                        # Lazy Open
+                        self.File_Extract( old_image )
+                        self.File_Extract( old_backup )
+                        self.File_Extract( old_text )
 
                         # Image File
                         try:
                             exists = os.path.exists( new_image )
                             if ( old_image != new_image and exists == False ):
                                 os.rename( old_image, new_image )
+                                self.Note_Rename( os.path.splitext( item_i )[0], os.path.splitext( os.path.basename( new_image ) )[0] )
                         except:
                             pass
                         # Backup File
@@ -1465,9 +1935,9 @@ class ProjectPages_Docker( DockWidget ):
                     self.Page_Conflict()
 
         # Update
-        self.Page_Update()
-    def Page_Export( self ):
-        if self.project_active == True:
+        self.Page_Update( [ "IMAGES", "TEXTS" ] )
+    def Page_Export( self, dry=False ):
+        if ( self.project_active == True and self.export_run == None ):
             # Dialog
             file_dialog = QFileDialog( QWidget( self ) )
             file_dialog.setFileMode( QFileDialog.DirectoryOnly )
@@ -1479,83 +1949,285 @@ class ProjectPages_Docker( DockWidget ):
                 if closed == True:
                     # All Items
                     all_items = self.Items_All()
-                    limit = len( all_items )
 
-                    # Progress Bar
-                    self.layout.progress_bar.setMaximum( limit )
-                    self.layout.progress_bar.setValue( 0 )
+                    # Plan ( only pages changed since the last export into this directory )
+                    manifest = Export_Manifest( export_path )
+                    settings = self.Export_Settings()
+                    resumed = manifest.Resume( settings )
+                    pages = {}
+                    for item in all_items:
+                        image_path = os.path.normpath( os.path.join( self.project_images, item ) )
+                        pages[item] = ( image_path, self.File_Stat( image_path ) )
+                    plan = manifest.Plan( pages, settings, self.Export_Digest )
+                    if resumed > 0:
+                        self.Message_Log( "EXPORT", f"resumed { resumed } pages of an interrupted export" )
+                    if dry == True:
+                        self.Export_Report( plan )
+                        return
 
                     # Start
-                    row = self.layout.page_list.currentRow()
                     self.Pages_Block( True )
-                    Krita.instance().setBatchmode( True )
-
-                    # Export Document
-                    index = 0
-                    for i in range( 0, len( all_items ) ):
-                        # Progress Bar
-                        self.layout.progress_bar.setValue( i + 1 )
-                        QApplication.processEvents()
-
-                        # Paths
-                        item = all_items[i]
-                        extension = item.split( "." )[-1]
-                        basename_i = item.replace( f".{ extension }", "" )
-
-                        # Widget
-                        self.layout.page_list.setCurrentRow( i )
-                        self.layout.text_note.setText( f"Exporting : { item }" )
-
-                        # Path
-                        image_path = os.path.normpath( os.path.join( self.project_images, item ) )
-
-                        # Animation
-                        if image_path.endswith( ".kra" ) == True:
-                            # Document
-                            document = Krita.instance().openDocument( image_path )
-                            width = document.width()
-                            height = document.height()
-                            boolean, clip_start, clip_end = self.Animation_Document( document )
-                            for anim in range( clip_start, clip_end + 1 ):
-                                document.setCurrentTime( anim )
-                                document.waitForDone()
-                                if boolean == False:
-                                    save_path = os.path.normpath( os.path.join( export_path, f"{ basename_i }.png" ) )
-                                else:
-                                    save_path = os.path.normpath( os.path.join( export_path, f"{ basename_i }_f{ str( anim ).zfill( 4 ) }.png" ) )
-                                qimage = document.thumbnail( width, height )
-                                qimage.save( save_path )
-                                document.waitForDone()
-                            document.close()
-                        else:
-                            save_path = os.path.normpath( os.path.join( export_path, f"{ basename_i }.png" ) )
-                            qpixmap = QPixmap( image_path )
-                            qpixmap.save( save_path )
-
-                        # Cycle
-                        index = self.Limit_Loop( index + 1, limit )
-
-                    # Progress Bar
-                    self.layout.progress_bar.setMaximum( limit )
-                    self.layout.progress_bar.setValue( 0 )
-
-                    # End
-                    self.layout.text_note.clear()
-                    Krita.instance().setBatchmode( False )
-                    self.Pages_Block( False )
-
-                    # Previous Select
-                    self.layout.page_list.setCurrentRow( row )
+                    self.export_run = {
+                        "path" : export_path,
+                        "manifest" : manifest,
+                        "settings" : settings,
+                        "pages" : pages,
+                        "plan" : plan,
+                        "presets" : self.export_presets,
+                        "row" : self.Page_Row(),
+                        "outputs" : {},
+                        "documents" : [],
+                        "removed" : 0,
+                        "failed" : 0,
+                        "batch" : False,
+                        "time" : 0,
+                        }
+                    try:manifest.Journal_Start( settings )
+                    except OSError as e:self.Message_Log( "EXPORT", f"journal { e }" )
+
+                    # Trashed Pages
+                    for page in plan["removed"]:
+                        self.export_run["removed"] += manifest.Remove( page )
+
+                    # Static Pages ( decoded once and written for every preset in thread pools )
+                    presets = self.export_presets
+                    presets_page = [ p for p in presets if p["format"] not in preset_sequences ]
+                    for preset in presets:
+                        os.makedirs( os.path.dirname( Preset_Target( export_path, preset, "page" ) ), exist_ok=True )
+                    jobs = []
+                    for item in plan["build"]:
+                        image_path = pages[item][0]
+                        self.File_Extract( image_path )
+                        name = os.path.splitext( item )[0]
+                        jobs.append( ( image_path, [ ( preset, Preset_Target( export_path, preset, name ) ) for preset in presets_page ] ) )
+                    self.export_progress.Start( len( jobs ) )
+                    self.Export_Status()
+                    self.export_worker = Worker_Export( self.export_engine, jobs, self )
+                    self.export_worker.SIGNAL_PAGE.connect( self.Export_Page )
+                    self.export_worker.SIGNAL_FINISH.connect( self.Export_Static )
+                    self.export_worker.start()
                 else:
                     self.Page_Conflict()
+    def Export_Page( self, source, targets, kind, digest=None ):
+        # Checkpoint of each finished page ( hashed by the worker )
+        run = self.export_run
+        item = os.path.basename( source )
+        names = [ os.path.relpath( t, run["path"] ) for t in targets ]
+        run["outputs"][item] = names
+        try:run["manifest"].Journal_Add( item, self.File_Stat( source ), names, digest )
+        except OSError as e:self.Message_Log( "EXPORT", f"journal { e }" )
+        self.export_progress.Step( item )
+        self.Export_Status()
+    def Export_Static( self, report ):
+        # Worker
+        self.export_worker.wait()
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        run = self.export_run
+        run["time"] = report["time"]
+        if "error" in report:
+            self.Message_Log( "EXPORT", f"error { report['error'] }" )
+        for item, error in report["failed"]:
+            self.Message_Log( "EXPORT", f"failed { item } { error }" )
+        run["failed"] += len( report["failed"] )
+
+        # Animated Pages ( need the Krita timeline, one per turn of the event loop )
+        run["documents"] = [ source for source, target in report["documents"] ]
+        run["digests"] = report["digests"]
+        if ( len( run["documents"] ) > 0 and report["cancelled"] == False ):
+            Krita.instance().setBatchmode( True )
+            run["batch"] = True
+            self.export_progress.total += len( run["documents"] )
+            QtCore.QTimer.singleShot( 0, self.Export_Next )
+        else:
+            self.Export_Finish()
+    def Export_Next( self ):
+        run = self.export_run
+        if ( len( run["documents"] ) == 0 or self.export_engine.cancel.is_set() == True ):
+            self.Export_Finish()
+            return
+        source = run["documents"].pop( 0 )
+        item = os.path.basename( source )
+        self.export_progress.page = item
+        self.Export_Status()
+        start = time.perf_counter()
+        outputs = self.Export_Document( source, run["path"], run["presets"] )
+        run["time"] += time.perf_counter() - start
+        self.Export_Page( source, [ os.path.join( run["path"], o ) for o in outputs ], export_document, run["digests"].get( source, None ) )
+        QtCore.QTimer.singleShot( 0, self.Export_Next )
+    def Export_Finish( self ):
+        run = self.export_run
+        if run["batch"] == True:
+            Krita.instance().setBatchmode( False )
+        self.export_engine.Stop()
+        for line in self.export_engine.Throughput( run["time"] ):
+            self.Message_Log( "EXPORT", line )
+
+        # Manifest ( a finished run drops the journal, a cancelled one keeps it to resume )
+        manifest = run["manifest"]
+        outputs = run["outputs"]
+        cancelled = self.export_engine.cancel.is_set()
+        manifest.Settings_Set( run["settings"], outputs )
+        try:
+            manifest.Save()
+            if cancelled == True:
+                manifest.Journal_Close()
+            else:
+                manifest.Journal_End()
+        except OSError as e:
+            self.Message_Log( "EXPORT", f"manifest { e }" )
+        status = "cancelled" if cancelled == True else "built"
+        self.Message_Float( "EXPORT", f"{ len( outputs ) } { status } | { len( run['plan']['skip'] ) } unchanged | { run['removed'] } removed | { run['failed'] } failed in { round( self.export_progress.Status()['time'], 2 ) }s", "document-export" )
 
-        # Update
+        # Progress Bar
+        self.layout.progress_bar.setValue( 0 )
+        self.layout.progress_bar.setToolTip( "" )
+
+        # End
+        self.export_run = None
+        self.Pages_Block( False )
+        self.Page_Row_Set( run["row"] )
         self.Page_Update()
+    def Export_Cancel( self ):
+        # Finished pages stay in the journal and the next export resumes after them
+        if self.export_run != None:
+            self.export_engine.Cancel()
+            self.Message_Log( "EXPORT", "cancel" )
+    def Export_Status( self ):
+        status = self.export_progress.Status()
+        eta = "-" if status["eta"] == None else f"{ round( status['eta'] ) }s"
+        string = f"Export { status['done'] } / { status['total'] } | { round( status['rate'], 2 ) } pages/s | ETA { eta }"
+        if status["page"] != "":
+            string += f" | { status['page'] }"
+        self.layout.progress_bar.setMaximum( max( status["total"], 1 ) )
+        self.layout.progress_bar.setValue( status["done"] )
+        self.layout.progress_bar.setToolTip( string )
+    def Export_Settings( self ):
+        # A change rebuilds every page
+        settings = {
+            "presets" : self.export_presets,
+            }
+        return settings
+    def Export_Presets( self ):
+        # One preset per line
+        string = "name | format | quality | size | color\n"
+        string += f"format { ', '.join( preset_formats ) } | quality -1 to 100 | size 0 is full | color { ', '.join( preset_colors ) }"
+        text, boolean = QtWidgets.QInputDialog.getMultiLineText( self, DOCKER_NAME, string, Preset_Text( self.export_presets ) )
+        if boolean == True:
+            presets = Preset_Parse( text )
+            if len( presets ) == 0:
+                presets = [ dict( preset_default ) ]
+            self.export_presets = presets
+            Krita.instance().writeSetting( DOCKER_NAME, "export_presets", str( self.export_presets ) )
+    def Export_Digest( self, path ):
+        try:return self.content.Hash( path, self.File_Stream )
+        except OSError:return None
+    def Export_Report( self, plan ):
+        # Dry run
+        limit = 50
+        message = f"Export Plan\n\n{ len( plan['build'] ) } to build | { len( plan['skip'] ) } unchanged | { len( plan['removed'] ) } to remove\n"
+        lines = [ f"build { page } ( { plan['reasons'][page] } )" for page in plan["build"] ]
+        lines += [ f"remove { page }" for page in plan["removed"] ]
+        for i in range( 0, len( lines ) ):
+            if i < limit:
+                message += lines[i] + "\n"
+            else:
+                message += "...\n"
+                break
+        self.Message_Log( "EXPORT", message.replace( "\n", " | " ) )
+        QMessageBox.information( self, DOCKER_NAME, message[:-1] )
+    def Export_Document( self, image_path, export_path, presets ):
+        # Names
+        item = os.path.basename( image_path )
+        basename_i = os.path.splitext( item )[0]
+        # Document
+        document = Krita.instance().openDocument( image_path )
+        width = document.width()
+        height = document.height()
+        boolean, clip_start, clip_end = self.Animation_Document( document )
+        presets_frame = [ p for p in presets if p["format"] not in preset_sequences ]
+        outputs = []
+
+        # Sequences built while the frames arrive
+        sequences = []
+        if boolean == True:
+            count = clip_end - clip_start + 1
+            for preset in presets:
+                target = Preset_Target( export_path, preset, basename_i )
+                if preset["format"] == "apng":
+                    sequences.append( Sequence_APNG( target, count, document.framesPerSecond(), functools.partial( self.Export_PNG, preset=preset ) ) )
+                elif preset["format"] == "sheet":
+                    sequences.append( Sequence_Sheet( target, count, functools.partial( self.Export_Convert, preset=preset ) ) )
+                else:
+                    continue
+                outputs.append( os.path.relpath( target, export_path ) )
+
+        # Render thread only grabs frames, workers encode them
+        pipeline = Frame_Pipeline( self.export_engine, sequences )
+        for anim in range( clip_start, clip_end + 1 ):
+            start = time.perf_counter()
+            document.setCurrentTime( anim )
+            document.waitForDone()
+            if boolean == False:
+                name = basename_i
+            else:
+                name = f"{ basename_i }_f{ str( anim ).zfill( 4 ) }"
+            qimage = document.thumbnail( width, height )
+            targets = [ ( preset, Preset_Target( export_path, preset, name ) ) for preset in presets_frame ]
+            pipeline.Push( qimage, targets, time.perf_counter() - start )
+            outputs.extend( [ os.path.relpath( t, export_path ) for p, t in targets ] )
+        document.close()
+        report = pipeline.Finish()
+        for error in report["failed"]:
+            self.Message_Log( "EXPORT", f"failed { item } { error }" )
+        self.Message_Log( "EXPORT", f"{ item } { report['frames'] } frames in { round( report['time'], 2 ) }s | { round( report['fps'], 2 ) } fps | render { round( report['render'], 2 ) }s" )
+        return outputs
+    def Export_Transcode( self, source, target ):
+        # QImage is safe outside the GUI thread ( QPixmap is not )
+        qimage = QImage( source )
+        if ( qimage.isNull() == True or qimage.save( target, "PNG" ) == False ):
+            raise OSError( f"transcode { os.path.basename( source ) }" )
+    def Export_Decode( self, data ):
+        qimage = QImage.fromData( data )
+        if qimage.isNull() == True:
+            raise OSError( "decode" )
+        return qimage
+    def Export_Encode( self, qimage, preset, target ):
+        qimage = self.Export_Convert( qimage, preset )
+        if qimage.save( target, preset["format"].upper(), preset["quality"] ) == False:
+            raise OSError( f"encode { preset['format'] }" )
+    def Export_PNG( self, qimage, preset ):
+        # Frames of an animated PNG share one pixel format
+        qimage = self.Export_Convert( qimage, preset ).convertToFormat( QImage.Format_ARGB32 )
+        data = QtCore.QByteArray()
+        buffer = QtCore.QBuffer( data )
+        buffer.open( QtCore.QIODevice.WriteOnly )
+        qimage.save( buffer, "PNG" )
+        buffer.close()
+        return bytes( data )
+    def Export_Convert( self, qimage, preset ):
+        # Size
+        size = preset["size"]
+        if ( size > 0 and max( qimage.width(), qimage.height() ) > size ):
+            qimage = qimage.scaled( size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation )
+        # Color ( formats without alpha are flattened on white )
+        color = preset["color"]
+        if ( color == "rgb" or preset["format"] == "jpg" ) and qimage.hasAlphaChannel() == True:
+            flat = QImage( qimage.size(), QImage.Format_RGB32 )
+            flat.fill( QColor( 255, 255, 255 ) )
+            painter = QtGui.QPainter( flat )
+            painter.drawImage( 0, 0, qimage )
+            painter.end()
+            qimage = flat
+        if color == "gray":
+            qimage = qimage.convertToFormat( QImage.Format_Grayscale8 )
+        return qimage
     def Page_Project_Thumbnail( self, name ):
         if ( self.project_active == True and name != None ):
             # File
             temp_ip = os.path.normpath( os.path.join( self.project_directory, "IMAGES" ) )
             image_path = os.path.normpath( os.path.join( temp_ip, name ) )
+            self.File_Extract( image_path )
             qreader = QImageReader( image_path )
             if qreader.canRead() == True:
                 qimage = qreader.read()
@@ -1574,10 +2246,7 @@ class ProjectPages_Docker( DockWidget ):
             if qimage.isNull() == False:
                 qimage = qimage.scaled( 500, 500, Qt.KeepAspectRatio, Qt.SmoothTransformation )
                 qimage.save( self.project_thumbnail )
-                self.ZIP_Save()
-
-        # Display Update
-        self.Project_Thumbnail( self.project_recent )
+                self.ZIP_Save() # Project thumbnail is updated when the save finishes
     def Page_Trash( self, lista ):
         # Variables
         count = len( lista )
@@ -1599,6 +2268,7 @@ class ProjectPages_Docker( DockWidget ):
 
         # Delete
         if confirm == QMessageBox.Yes and self.project_active == True:
+            self.Note_Flush( True )
             # Delete
             for i in range( 0, len( lista ) ):
                 # Parsing
@@ -1608,25 +2278,49 @@ class ProjectPages_Docker( DockWidget ):
                 path_image  = os.path.normpath( os.path.join( self.project_images, item_i ) )
                 path_backup = os.path.normpath( os.path.join( self.project_images, f"{ item_i }~" ) )
                 path_text   = os.path.normpath( os.path.join( self.project_texts,  f"{ basename_i }.eo" ) )
+                # Lazy Open
+                self.File_Extract( path_image )
+                self.File_Extract( path_backup )
+                self.File_Extract( path_text )
 
                 # Image File
-                try:shutil.move( path_image, self.project_trash, copy_function = shutil.copytree )
-                except:pass
+                try:
+                    trash_image = self.Trash_Name( path_image )
+                    shutil.move( path_image, trash_image, copy_function = shutil.copytree )
+                    self.Note_Rename( os.path.splitext( item_i )[0], os.path.splitext( os.path.basename( trash_image ) )[0] )
+                except:
+                    pass
                 # Backup File
-                try:shutil.move( path_backup, self.project_trash, copy_function = shutil.copytree )
+                try:shutil.move( path_backup, self.Trash_Name( path_backup ), copy_function = shutil.copytree )
                 except:pass
                 # Text File
-                try:shutil.move( path_text, self.project_trash, copy_function = shutil.copytree )
+                try:shutil.move( path_text, self.Trash_Name( path_text ), copy_function = shutil.copytree )
                 except:pass
 
         # Update
-        self.Page_Update()
-    def Page_Update( self ):
+        self.Page_Update( [ "IMAGES", "TEXTS", "TRASH" ] )
+    def Trash_Name( self, path ):
+        # Tagged so files with the same name never collide in the trash
+        number = len( self.found_trash )
+        while True:
+            trash_tag = "[ Trash_{number} ] ".format( number=str( number ).zfill( 4 ) )
+            new_name = os.path.normpath( os.path.join( self.project_trash, trash_tag + os.path.basename( path ) ) )
+            if ( os.path.exists( new_name ) == False and self.archive.Lazy_Check( self.project_directory, new_name ) == False ):
+                return new_name
+            number += 1
+    def Page_Update( self, folders=[] ):
+        # Notes may have moved with their pages
+        self.Note_Flush( True )
+        self.note_buffer.Clear()
+        # Own changes are read right away, only in the folders touched ( IMAGES, TEXTS, TRASH )
+        for name in folders:
+            self.project_index.Dirty( name )
         self.File_List()
         self.Index_Range( self.found_images, self.found_texts )
 
     def Pages_Block( self, boolean ):
         self.layout.page_list.blockSignals( boolean )
+        self.layout.page_list.selectionModel().blockSignals( boolean )
         self.layout.text_note.blockSignals( boolean )
     def Animation_Document( self, document ):
         # Read
@@ -1645,93 +2339,173 @@ class ProjectPages_Docker( DockWidget ):
         self.Message_Warnning( "ERROR", "Edit conflict\nClose all active pages from canvas to run" )
 
     def Page_Thumbnail( self ):
-        # Starting Empty
-        self.layout.page_list.clear()
-
-        # Images List Draw
-        if ( self.project_active == True and len( self.found_images ) > 0 ):
-            for i in range( 0, len( self.found_images ) ):
-                # Variables
-                path = self.found_images[i]
-                basename = os.path.basename( path )
-
-                # Create Items
-                item = QListWidgetItem( basename )
-                size = 100
-                # Thumbnail
-                bg = QPixmap( size, size )
-                bg.fill( self.color_alpha )
-                pix = QPixmap( path ).scaled( size, size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation )
-                # Variables
-                w = pix.width()
-                h = pix.height()
-                px = int( ( size * 0.5 ) - ( w * 0.5 ) )
-                py = int( ( size * 0.5 ) - ( h * 0.5 ) )
-                # Composed Image
-                painter = QPainter( bg )
-                painter.drawPixmap( px, py, pix )
-                painter.end()
-                # Item
-                qicon = QIcon( bg )
-                item.setIcon( qicon )
-                self.layout.page_list.addItem( item )
+        # Closed Project
+        if self.project_active == False:
+            self.Thumbnail_Cancel()
+            self.page_model.Clear()
+            return
+        # Rows only change where pages differ, icons are asked by the view when drawn
+        size = 100
+        paths = list( self.found_images )
+        keys = {}
+        for path in paths:
+            record = self.page_registry.Page_Path( path )
+            if ( record != None and record.stat != None ):
+                keys[path] = ( path, record.stat[0], record.stat[1], size )
+            else:
+                keys[path] = self.File_Key( path, size )
+        if self.page_model.Reconcile( paths, keys ) == True:
+            self.thumbnail_cache.Stats_Reset()
+    def Page_Current( self ):
+        index = self.layout.page_list.currentIndex()
+        if index.isValid() == False:
+            return None
+        return index.data( Qt.DisplayRole )
+    def Page_Row( self ):
+        return self.layout.page_list.currentIndex().row()
+    def Page_Row_Set( self, row ):
+        self.page_model.Fetch_Row( row )
+        self.layout.page_list.setCurrentIndex( self.page_model.index( row, 0 ) )
+    def Page_Selected( self ):
+        rows = self.layout.page_list.selectionModel().selectedRows()
+        return [ index.data( Qt.DisplayRole ) for index in sorted( rows, key=lambda index: index.row() ) ]
+    def Thumbnail_Placeholder( self, size ):
+        bg = QPixmap( size, size )
+        color = QColor( self.color_thumbnail )
+        color.setAlpha( 60 )
+        bg.fill( color )
+        return bg
+    def Thumbnail_Request( self, path, key ):
+        # Asked by the model for rows being drawn
+        if ( path in self.thumbnail_jobs and self.thumbnail_jobs[path] == key ):
+            return
+        self.thumbnail_jobs[path] = key
+        size = 100
+        archive = None
+        arcname = None
+        if ( self.project_active == True and self.archive.Lazy_Check( self.project_directory, path ) == True ):
+            archive = self.project_zip
+            arcname = self.archive.Lazy_Arcname( self.project_directory, path )
+        job = Thumbnail_Job( self.thumbnail_signals, path, key, size, self.color_alpha, self.thumbnail_cache, self.preview, self.archive_pool, archive, arcname )
+        self.thumbnail_pool.start( job )
+    def Thumbnail_Queue( self ):
+        # Rows scrolled out of view are dropped and the view asks again for what it draws, started jobs are kept
+        self.thumbnail_pool.clear()
+        running = self.thumbnail_signals.Running()
+        self.thumbnail_jobs = { path : key for path, key in self.thumbnail_jobs.items() if path in running }
+        self.layout.page_list.viewport().update()
+    def Thumbnail_Scroll( self, value ):
+        if len( self.thumbnail_jobs ) > 0:
+            self.timer_thumbnail.start( 100 )
+    def Thumbnail_Done( self, generation, path, key, qimage ):
+        # Results for an older version of the page wait for the newer job
+        if ( generation == self.thumbnail_signals.generation and path in self.thumbnail_jobs and self.thumbnail_jobs[path] == key ):
+            self.thumbnail_jobs.pop( path, None )
+            self.page_model.Icon_Set( path, key, qimage )
+            if len( self.thumbnail_jobs ) == 0:
+                cache = self.thumbnail_cache
+                pool = self.archive_pool.Stats()
+                self.Message_Log( "THUMBNAIL", f"memory { cache.hits_memory } disk { cache.hits_disk } decoded { cache.misses } | readers hits { pool['hits'] } misses { pool['misses'] } open { pool['open'] }" )
+    def Thumbnail_Cancel( self ):
+        # Running jobs finish but their results are ignored
+        self.thumbnail_signals.generation += 1
+        self.thumbnail_pool.clear()
+        self.thumbnail_jobs = {}
+        self.timer_thumbnail.stop()
 
     #endregion
     #region Files
 
     def File_List( self ):
         if self.project_active == True:
-            # Directory Images
-            self.dir_image = QDir( self.project_images )
-            self.dir_image.setSorting( QDir.LocaleAware )
-            self.dir_image.setFilter( QDir.Files | QDir.NoSymLinks | QDir.NoDotAndDotDot )
-            self.dir_image.setNameFilters( file_image )
-            images = self.dir_image.entryInfoList()
-            # Found Images
-            self.found_images = []
-            for i in range( 0, len( images ) ):
-                image_i = images[i].filePath()
-                if image_i.endswith( "-autosave.kra" ) == False: # Ignore autosaves
-                    self.found_images.append( image_i )
-
-            # Directory Texts
-            self.dir_text = QDir( self.project_texts )
-            self.dir_text.setSorting( QDir.LocaleAware )
-            self.dir_text.setFilter( QDir.Files | QDir.NoSymLinks | QDir.NoDotAndDotDot )
-            self.dir_text.setNameFilters( file_text )
-            texts = self.dir_text.entryInfoList()
+            # Only folders changed since the last call are scanned
+            self.project_index.Flush()
+            key = self.File_Sort_Key()
+            directory = self.project_directory
+            # Found Images ( Lazy Open pages are still inside the archive )
+            self.found_images = self.project_index.Paths( "IMAGES", lambda: self.archive.Lazy_List( directory, "IMAGES", file_image ), key )
             # Found Texts
-            self.found_texts = []
-            for i in range( 0, len( texts ) ):
-                text_i = texts[i].filePath()
-                self.found_texts.append( text_i )
-
-            # Directory Texts
-            self.dir_trash = QDir( self.project_trash )
-            self.dir_trash.setSorting( QDir.LocaleAware )
-            self.dir_trash.setFilter( QDir.Files | QDir.NoSymLinks | QDir.NoDotAndDotDot )
-            trash = self.dir_trash.entryInfoList()
+            self.found_texts = self.project_index.Paths( "TEXTS", lambda: self.archive.Lazy_List( directory, "TEXTS", file_text ), key )
             # Found Trash
-            qfile = QFile()
-            self.found_trash = []
-            for i in range( 0, len( trash ) ):
-                # Rename Trash ( avoid name conflicts )
-                trash_i = trash[i].filePath()
-                boolean = os.path.basename( trash_i ).startswith( "[ Trash_" )
-                if boolean == False:
-                    basename = str( os.path.basename( trash_i ) )
-                    trash_tag = "[ Trash_{number} ] ".format( number=str( i ).zfill( 4 ) )
-                    new_name = os.path.normpath( os.path.join( self.project_trash, trash_tag + basename ) )
-                    qfile.rename( trash_i, new_name )
-                else:
-                    new_name = trash_i
-                self.found_trash.append( str( new_name ) )
+            self.found_trash = self.project_index.Paths( "TRASH", lambda: self.archive.Lazy_List( directory, "TRASH", [] ), key )
+            # Page Records
+            self.page_registry.Build( self.project_index.version, self.found_images, self.found_texts, self.File_Stat )
 
         if ( len( self.found_images ) == 0 and len( self.found_texts ) == 0 ):
             self.layout.text_note.clear()
 
         # Update
         self.Page_Thumbnail()
+    def File_Sort_Key( self ):
+        # Locale aware like QDir.LocaleAware
+        collator = QtCore.QCollator()
+        return functools.cmp_to_key( lambda a, b: collator.compare( os.path.basename( a ), os.path.basename( b ) ) )
+    def File_Extract( self, path ):
+        # Lazy Open extracts pages only when they are needed
+        if ( self.project_active == True and path != None and self.archive.Lazy_Check( self.project_directory, path ) == True ):
+            self.archive.Lazy_Extract( self.project_directory, path )
+            self.project_index.Dirty( os.path.basename( os.path.dirname( path ) ) )
+            self.project_index.Touch()
+    def File_Text( self, path ):
+        if os.path.exists( path ) == True:
+            with open( path, "r" ) as note:
+                data = note.read()
+        else:
+            data = self.archive.Lazy_Read( self.project_directory, path )
+            data = "" if data == None else data.decode( "utf-8", "replace" )
+        return data
+    def File_Key( self, path, size ):
+        try:
+            stat = os.stat( path )
+            key = ( stat.st_size, stat.st_mtime_ns )
+        except OSError:
+            key = self.archive.Lazy_Key( self.project_directory, path )
+        if key == None:
+            return None
+        return ( path, key[0], key[1], size )
+    def File_Stat( self, path ):
+        # ( size, mtime_ns ) from the last folder scan
+        key = self.project_index.Entry( "IMAGES", path )
+        if key == None:
+            key = self.archive.Lazy_Key( self.project_directory, path )
+        return key
+    def File_Size( self, path ):
+        try:size = os.path.getsize( path )
+        except OSError:size = self.archive.Lazy_Size( self.project_directory, path )
+        return size
+    def File_Stream( self, path ):
+        if os.path.exists( path ) == True:
+            return open( path, "rb" )
+        return self.archive.Lazy_Stream( self.project_directory, path )
+    def Watch_Start( self ):
+        self.project_index.Clear()
+        self.project_index.Folder_Add( "IMAGES", self.project_images, file_image, [ "-autosave.kra" ] )
+        self.project_index.Folder_Add( "TEXTS", self.project_texts, file_text )
+        self.project_index.Folder_Add( "TRASH", self.project_trash )
+        folders = [ f for f in ( self.project_images, self.project_texts, self.project_trash ) if os.path.isdir( f ) ]
+        if len( folders ) > 0:
+            self.project_watcher.addPaths( folders )
+    def Watch_Stop( self ):
+        self.timer_watch.stop()
+        folders = self.project_watcher.directories()
+        if len( folders ) > 0:
+            self.project_watcher.removePaths( folders )
+        self.project_index.Clear()
+    def Watch_Changed( self, path ):
+        if self.project_index.Dirty_Path( path ) != None:
+            self.timer_watch.start( 250 )
+    def Watch_Apply( self ):
+        # Pages added or edited by other programs
+        if self.project_active == True:
+            version = self.project_index.version
+            deltas = self.project_index.Flush()
+            # Notes edited outside are read again
+            texts = deltas.get( "TEXTS", { "modified" : [], "removed" : [] } )
+            for name in texts["modified"] + texts["removed"]:
+                self.note_buffer.Forget( os.path.join( self.project_texts, name ) )
+            if self.project_index.version != version:
+                self.File_List()
+                self.Index_Range( self.found_images, self.found_texts )
     def File_Conflict( self, path ):
         self.Message_Warnning( "ERROR", "Namespace conflict\nFolder with same name already exists" )
         self.File_Location( path, "SELECT" ) # Shows the File that is causing conflict
@@ -1751,54 +2525,82 @@ class ProjectPages_Docker( DockWidget ):
         else:
             QDesktopServices.openUrl( QUrl.fromLocalFile( os.path.dirname( project_directory ) ) )
     def File_Search( self, path, mode ):
-        # Variables
-        limit = 5
+        # One search at a time
+        if self.search != None:
+            return
+        if mode == "PROJECT":
+            patterns = [ "*.project_pages.zip" ]
+            known = self.project_recent
+        elif mode == "PAGE":
+            patterns = file_image.copy()
+            patterns.remove( "*.zip" )
+            known = self.found_images
 
         # UI
-        self.Message_Warnning( "SEARCH", "Start" )
-        # Progress Bar
-        self.layout.progress_bar.setMaximum( limit )
+        self.Message_Float( "SEARCH", "Start", "document-open" )
+        # Progress Bar ( busy )
+        self.layout.progress_bar.setMaximum( 0 )
         self.layout.progress_bar.setValue( 0 )
 
-        # Items
-        item = []
-        if mode == "PROJECT":
-            files = QtCore.QDirIterator( path, ["*.project_pages.zip"], flags=QDirIterator.Subdirectories )
-        elif mode == "PAGE":
-            filter_images = file_image.copy()
-            filter_images.remove( "*.zip" )
-            files = QtCore.QDirIterator( path, file_image, flags=QDirIterator.Subdirectories )
-
-        # Iterator
-        index = 0
-        while files.hasNext():
-            # Progress Bar
-            self.layout.progress_bar.setValue( index )
-            QApplication.processEvents()
-            # Search
-            item = os.path.normpath( files.next() )
-            if mode == "PROJECT":
-                if item not in self.project_recent:
-                    self.Project_Recent_Add( item )
-            elif mode == "PAGE":
-                if item not in self.found_images:
-                    self.Page_Source( item )
-            self.Message_Log( "IMPORT", f"file { item }" )
-            # Cycle
-            index = self.Limit_Loop( index + 1, limit )
+        # Pages are copied batch by batch while the walk goes on
+        self.search_import = None
+        if mode == "PAGE":
+            opener = functools.partial( Member_Open, self.archive_pool, self.project_zip, self.project_directory )
+            self.search_import = Search_Import( self.project_images, self.content, self.Import_Existing(), opener )
+
+        # Worker
+        self.search = Search_Files( path, patterns, known )
+        self.search_mode = mode
+        self.search_worker = Worker_Search( self.search, self, self.search_import )
+        self.search_worker.SIGNAL_BATCH.connect( self.Search_Batch )
+        self.search_worker.SIGNAL_COUNT.connect( self.Search_Count )
+        self.search_worker.SIGNAL_IMPORT.connect( self.Search_Import )
+        self.search_worker.SIGNAL_FINISH.connect( self.Search_Finish )
+        self.search_worker.start()
+    def Search_Batch( self, batch ):
+        for item in batch:
+            self.Message_Log( "SEARCH", f"file { item }" )
+    def Search_Count( self, scanned, found ):
+        self.layout.progress_bar.setToolTip( f"Search | { scanned } scanned | { found } found" )
+    def Search_Import( self, imported, found ):
+        self.layout.progress_bar.setMaximum( found )
+        self.layout.progress_bar.setValue( imported )
+    def Search_Cancel( self ):
+        if self.search != None:
+            self.search.Cancel()
+        if self.search_import != None:
+            self.search_import.Cancel()
+    def Search_Finish( self, report ):
+        # Worker
+        mode = self.search_mode
+        self.search_worker.wait()
+        self.search_worker.deleteLater()
+        self.search = None
+        self.search_mode = None
+        self.search_worker = None
+        self.search_import = None
+        # Progress Bar
+        self.layout.progress_bar.setMaximum( 1 )
+        self.layout.progress_bar.setValue( 0 )
+        self.layout.progress_bar.setToolTip( "" )
+        if "error" in report:
+            self.Message_Warnning( "ERROR", f"Search\n{ report['error'] }" )
 
-        # Update
+        # Commit once ( a cancelled search keeps what it found )
+        found = report["found"]
         if mode == "PROJECT":
-            self.Project_Thumbnail( self.project_recent )
-            Krita.instance().writeSetting( DOCKER_NAME, "project_recent", str( self.project_recent ) )
+            if len( found ) > 0:
+                self.project_recent = ( found + [ p for p in self.project_recent if p not in found ] )[:100]
+                self.Project_Thumbnail( self.project_recent, found )
+                Krita.instance().writeSetting( DOCKER_NAME, "project_recent", str( self.project_recent ) )
         elif mode == "PAGE":
-            self.Page_Update()
-            self.Page_Thumbnail()
-        self.Message_Warnning( "SEARCH", "Finish" )
-
-        # Progress Bar
-        self.layout.progress_bar.setMaximum( limit )
-        self.layout.progress_bar.setValue( 0 )
+            imported = report.get( "import", None )
+            if ( self.project_active == True and imported != None ):
+                self.Import_Report( imported["copied"], imported["failed"], imported["duplicates"], imported["bytes_saved"] )
+                self.Page_Update( [ "IMAGES", "TEXTS" ] )
+        # Report
+        state = "Cancel" if report["cancelled"] == True else "Finish"
+        self.Message_Float( "SEARCH", f"{ state } | { report['scanned'] } scanned | { len( found ) } found", "document-open" )
 
    #endregion
     #region Information
@@ -1904,9 +2706,7 @@ class ProjectPages_Docker( DockWidget ):
             # Krita Version from KRA file save
             try:
                 target = "maindoc.xml"
-                if zipfile.is_zipfile( path ):
-                    archive = zipfile.ZipFile( path, "r" )
-                    archive_open = archive.open( target )
+                with self.archive_pool.Stream( path, target ) as archive_open:
                     ET = xml.etree.ElementTree
                     tree = ET.parse( archive_open )
                     root = tree.getroot()
@@ -2609,9 +3409,20 @@ class ProjectPages_Docker( DockWidget ):
                             except:
                                 self.dialog.doc_gv.setText( "" )
 
+                        # Archive
+                        if item[0] == "zip_compression":
+                            try:self.zip_compression = str( item[1] )
+                            except:self.zip_compression = "deflate"
+                        if item[0] == "zip_level":
+                            try:self.zip_level = eval( item[1] )
+                            except:self.zip_level = 6
+
                     # Widgets
                     self.Doc_Custom_Check() # Updates Template Dropbox with W,H as input
                     self.Dialog_Block( False )
+
+                    # Archive
+                    self.Archive_Compression( self.zip_compression, self.zip_level )
     def Control_Save( self ):
         if ( self.project_active == True and self.project_control != None ):
             # Data to be Saved
@@ -2628,7 +3439,10 @@ class ProjectPages_Docker( DockWidget ):
                 f"doc_dpi={ self.doc_dpi }\n" +
                 # Guides Template
                 f"doc_gh={ self.doc_gh }\n" +
-                f"doc_gv={ self.doc_gv }\n"
+                f"doc_gv={ self.doc_gv }\n" +
+                # Archive ( stored, deflate, bzip2, lzma )
+                f"zip_compression={ self.zip_compression }\n" +
+                f"zip_level={ self.zip_level }\n"
                 )
 
             # Save to EO file
@@ -2652,7 +3466,7 @@ class ProjectPages_Docker( DockWidget ):
         check = self.Check_Active()
         if check == True:
             self.Control_Save()
-            self.ZIP_Save()
+            self.Save_Request( save_delay )
         # Display
         self.Page_Thumbnail()
     def View_Closed( self ):
@@ -2760,6 +3574,10 @@ class ProjectPages_Docker( DockWidget ):
     def leaveEvent( self, event ):
         pass
     def closeEvent( self, event ):
+        self.Export_Cancel()
+        if self.export_worker != None:
+            self.export_worker.wait()
+        self.Note_Flush( True )
         self.ZIP_Exit( self.project_directory )
 
     def eventFilter( self, source, event ):
@@ -0,0 +1,767 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import json
+import time
+import zlib
+import shutil
+import struct
+import zipfile
+import threading
+import concurrent.futures
+
+#endregion
+#region Global Variables
+
+# PNG
+png_signature = b"\x89PNG\r\n\x1a\n"
+# Manifest in the export directory
+export_manifest = "project_pages_export.json"
+export_journal = "project_pages_export.journal" # one line per finished page while a run is going
+export_version = 1
+# Kinds of page
+export_container = "container" # merged image streamed out of the page zip
+export_copy = "copy" # already a png
+export_transcode = "transcode" # raster decoded and written as png
+export_document = "document" # opened with Krita ( animations )
+# Presets ( size 0 is full size, quality -1 is the encoder default )
+preset_default = {
+    "name" : "",
+    "format" : "png",
+    "quality" : -1,
+    "size" : 0,
+    "color" : "keep",
+    }
+preset_formats = {
+    "png" : ".png",
+    "jpg" : ".jpg",
+    "webp" : ".webp",
+    "tiff" : ".tif",
+    "apng" : ".png", # animated pages as one animated PNG
+    "sheet" : ".png", # animated pages as one sprite sheet
+    }
+preset_sequences = [ "apng", "sheet" ] # only written for animated pages
+preset_colors = [ "keep", "rgb", "gray" ]
+# Pages that are zip containers with a merged image
+export_members = {
+    ".kra" : "mergedimage.png",
+    ".krz" : "mergedimage.png",
+    ".ora" : "mergedimage.png",
+    }
+
+#endregion
+#region Functions
+
+def Preset_Name( preset ):
+    return preset["name"] if preset["name"] != "" else "default"
+def Preset_Raw( preset ):
+    # Full size PNG is written without decoding the page
+    return ( preset["format"] == "png" and preset["size"] == 0 and preset["color"] == "keep" )
+def Preset_Parse( text ):
+    # One preset per line "name | format | quality | size | color"
+    presets = []
+    for line in text.splitlines():
+        if line.strip() == "":
+            continue
+        parts = [ p.strip() for p in line.split( "|" ) ]
+        parts += [ "" ] * ( 5 - len( parts ) )
+        preset = dict( preset_default )
+        preset["name"] = parts[0]
+        if parts[1].lower() in preset_formats:
+            preset["format"] = parts[1].lower()
+        try:preset["quality"] = max( -1, min( 100, int( parts[2] ) ) )
+        except ValueError:pass
+        try:preset["size"] = max( 0, int( parts[3] ) )
+        except ValueError:pass
+        if parts[4].lower() in preset_colors:
+            preset["color"] = parts[4].lower()
+        presets.append( preset )
+    return presets
+def Preset_Text( presets ):
+    return "\n".join( f"{ p['name'] } | { p['format'] } | { p['quality'] } | { p['size'] } | { p['color'] }" for p in presets )
+def Preset_Target( directory, preset, name ):
+    # Unnamed preset writes in the directory, others in a folder of their name
+    folder = directory if preset["name"] == "" else os.path.join( directory, preset["name"] )
+    return os.path.normpath( os.path.join( folder, name + preset_formats[preset["format"]] ) )
+def Export_Kind( path ):
+    # How a page can be written without opening it in Krita
+    extension = os.path.splitext( path )[1].lower()
+    if extension == ".png":
+        return export_copy
+    if extension not in export_members:
+        return export_transcode
+    try:
+        with zipfile.ZipFile( path, "r" ) as archive:
+            names = set( archive.namelist() )
+            if export_members[extension] not in names:
+                return export_document
+            if extension != ".ora":
+                # Keyframes need the timeline ( every .kra has a default clip range so it tells nothing )
+                if any( n.endswith( ".keyframes.xml" ) for n in names ):
+                    return export_document
+    except ( OSError, zipfile.BadZipFile ):
+        return export_document
+    return export_container
+
+#endregion
+
+
+class Export_Engine():
+    """
+    Writes pages for every preset in thread pools without opening them in Krita
+    Each page is decoded once and its encodes fan out to a bounded encoder pool
+    """
+
+    #region Initialize
+
+    def __init__( self, workers=None, transcode=None, decode=None, encode=None, window=None, digest=None ):
+        # Variables
+        self.workers = workers if workers != None else min( 8, os.cpu_count() or 1 )
+        self.window = window if window != None else self.workers * 2 # encodes in flight
+        self.transcode = transcode # function( source, target ) for other raster formats
+        self.decode = decode # function( data ) returning an image
+        self.encode = encode # function( image, preset, target )
+        self.digest = digest # function( path ) returning the content hash of a page
+        self.cancel = threading.Event()
+        # Kinds { path : ( size, mtime_ns, kind ) }
+        self.kinds = {}
+        # Run
+        self.encoder = None
+        self.slots = None
+        self.lock = threading.Lock()
+        self.digests = {} # { source : content hash } of the pages of the last run
+        self.Stats_Reset()
+
+    def Cancel( self ):
+        self.cancel.set()
+    def Stats_Reset( self ):
+        self.stats = {} # { preset : { "pages", "time", "bytes" } }
+        self.stats_decode = { "pages" : 0, "time" : 0 }
+
+    #endregion
+    #region Pages
+
+    def Kind( self, path ):
+        # Cached while the page does not change
+        stat = os.stat( path )
+        key = ( stat.st_size, stat.st_mtime_ns )
+        cached = self.kinds.get( path, None )
+        if ( cached != None and cached[:2] == key ):
+            return cached[2]
+        kind = Export_Kind( path )
+        self.kinds[path] = ( key[0], key[1], kind )
+        return kind
+    def Read( self, source, kind ):
+        # Encoded bytes of the page image
+        if kind == export_container:
+            member = export_members[os.path.splitext( source )[1].lower()]
+            with zipfile.ZipFile( source, "r" ) as archive:
+                return archive.read( member )
+        with open( source, "rb" ) as file:
+            return file.read()
+    def Write( self, source, target, kind, preset=preset_default ):
+        # Full size PNG without decoding, written aside then swapped in
+        temp = target + ".part"
+        start = time.perf_counter()
+        try:
+            if kind == export_container:
+                member = export_members[os.path.splitext( source )[1].lower()]
+                with zipfile.ZipFile( source, "r" ) as archive:
+                    with archive.open( member, "r" ) as file, open( temp, "wb" ) as output:
+                        shutil.copyfileobj( file, output, 1024 * 1024 )
+            elif kind == export_copy:
+                shutil.copyfile( source, temp )
+            elif kind == export_transcode:
+                if self.transcode == None:
+                    raise OSError( "no transcoder" )
+                self.transcode( source, temp )
+            os.replace( temp, target )
+        except Exception:
+            try:os.remove( temp )
+            except OSError:pass
+            raise
+        self.Stats_Add( preset, time.perf_counter() - start, os.path.getsize( target ) )
+    def Page( self, source, outputs ):
+        """
+        outputs : [ ( preset, target ) ]
+        Returns the kind ( None when cancelled ), pages for Krita are not written
+        """
+        if self.cancel.is_set() == True:
+            return None
+        kind = self.Kind( source )
+        # Hashed here so the manifest never reads the page again on the GUI thread
+        if self.digest != None:
+            try:value = self.digest( source )
+            except OSError:value = None
+            with self.lock:
+                self.digests[source] = value
+        if kind == export_document:
+            return kind
+        raw = [ ( p, t ) for p, t in outputs if Preset_Raw( p ) == True ]
+        coded = [ ( p, t ) for p, t in outputs if Preset_Raw( p ) == False ]
+        for preset, target in raw:
+            self.Write( source, target, kind, preset )
+        if len( coded ) > 0:
+            start = time.perf_counter()
+            image = self.decode( self.Read( source, kind ) )
+            with self.lock:
+                self.stats_decode["pages"] += 1
+                self.stats_decode["time"] += time.perf_counter() - start
+            self.Fan_Out( image, coded )
+        return kind
+    def Fan_Out( self, image, outputs, wait=True ):
+        # One decoded image to every encoder, blocks while the window is full
+        futures = []
+        for preset, target in outputs:
+            self.slots.acquire()
+            try:
+                futures.append( self.encoder.submit( self.Encode, image, preset, target ) )
+            except Exception:
+                self.slots.release()
+                raise
+        if wait == True:
+            for future in futures:
+                future.result()
+        return futures
+    def Encode( self, image, preset, target ):
+        temp = target + ".part"
+        try:
+            start = time.perf_counter()
+            self.encode( image, preset, temp )
+            os.replace( temp, target )
+            self.Stats_Add( preset, time.perf_counter() - start, os.path.getsize( target ) )
+        except Exception:
+            try:os.remove( temp )
+            except OSError:pass
+            raise
+        finally:
+            self.slots.release()
+    def Stats_Add( self, preset, seconds, size ):
+        with self.lock:
+            entry = self.stats.setdefault( Preset_Name( preset ), { "pages" : 0, "time" : 0, "bytes" : 0 } )
+            entry["pages"] += 1
+            entry["time"] += seconds
+            entry["bytes"] += size
+
+    #endregion
+    #region Run
+
+    def Start( self ):
+        self.cancel.clear()
+        self.Stats_Reset()
+        self.digests = {}
+        self.slots = threading.BoundedSemaphore( self.window )
+        self.encoder = concurrent.futures.ThreadPoolExecutor( max_workers=self.workers )
+    def Stop( self ):
+        if self.encoder != None:
+            self.encoder.shutdown( wait=True )
+            self.encoder = None
+    def Run( self, jobs, progress=None, done=None ):
+        """
+        jobs : [ ( source, [ ( preset, target ) ] ) ]
+        progress : function receiving ( index, total ) in the calling thread
+        done : function receiving ( source, targets, kind, digest ) of each exported page in the calling thread
+        The encoder pool stays open until Stop so animated pages can use Fan_Out
+        """
+        # Variables
+        self.Start()
+        start = time.perf_counter()
+        exported = []
+        documents = []
+        failed = []
+        index = 0
+        total = len( jobs )
+
+        # Pool ( zlib, file writes and image codecs release the GIL )
+        with concurrent.futures.ThreadPoolExecutor( max_workers=self.workers ) as executor:
+            futures = { executor.submit( self.Page, source, outputs ) : ( source, outputs ) for source, outputs in jobs }
+            for future in concurrent.futures.as_completed( futures ):
+                source, outputs = futures[future]
+                if future.cancelled() == True:
+                    continue
+                try:
+                    kind = future.result()
+                    if kind == export_document:
+                        documents.append( ( source, outputs ) )
+                    elif kind != None:
+                        exported.append( ( source, [ t for p, t in outputs ], kind ) )
+                        if done != None:
+                            done( source, [ t for p, t in outputs ], kind, self.digests.get( source, None ) )
+                except Exception as e:
+                    failed.append( ( source, str( e ) ) )
+                index += 1
+                if progress != None:
+                    progress( index, total )
+                if self.cancel.is_set() == True:
+                    for pending in futures:
+                        pending.cancel()
+
+        report = {
+            "exported" : exported,
+            "documents" : sorted( documents, key=lambda d: d[0] ),
+            "digests" : dict( self.digests ),
+            "failed" : failed,
+            "cancelled" : self.cancel.is_set(),
+            "time" : time.perf_counter() - start,
+            }
+        return report
+    def Throughput( self, seconds ):
+        # Pages and megabytes per second of each preset over a wall time
+        lines = []
+        for name, entry in sorted( self.stats.items() ):
+            rate = entry["pages"] / seconds if seconds > 0 else 0
+            megabytes = entry["bytes"] / ( 1024 * 1024 )
+            lines.append( f"{ name } : { entry['pages'] } pages | { round( rate, 2 ) } pages/s | { round( megabytes, 2 ) } MB | encode { round( entry['time'], 2 ) }s" )
+        if self.stats_decode["pages"] > 0:
+            lines.append( f"decode : { self.stats_decode['pages'] } pages in { round( self.stats_decode['time'], 2 ) }s" )
+        return lines
+
+    #endregion
+
+def PNG_Chunk( kind, data ):
+    # Length, type, data and CRC of one PNG chunk
+    return struct.pack( ">I", len( data ) ) + kind + data + struct.pack( ">I", zlib.crc32( kind + data ) & 0xffffffff )
+
+
+class PNG_Stream():
+    """
+    RGBA PNG written a band of scanlines at a time so the whole image is never held in memory
+    """
+
+    #region Initialize
+
+    def __init__( self, target, width, height, level=6 ):
+        # Variables
+        self.target = target
+        self.width = width
+        self.height = height
+        self.level = level
+        self.temp = target + ".part"
+        self.file = None
+        self.compress = None
+        self.rows = 0
+
+    #endregion
+    #region Stream
+
+    def Header( self, height ):
+        return PNG_Chunk( b"IHDR", struct.pack( ">IIBBBBB", self.width, height, 8, 6, 0, 0, 0 ) )
+    def Open( self ):
+        self.file = open( self.temp, "wb" )
+        self.file.write( png_signature )
+        self.file.write( self.Header( self.height ) )
+        self.compress = zlib.compressobj( self.level )
+        self.rows = 0
+    def Rows( self, data, stride ):
+        # Raw RGBA scanlines with the filter byte 0 in front of each one
+        line = self.width * 4
+        count = min( len( data ) // stride, self.height - self.rows )
+        raw = b"".join( b"\x00" + data[i*stride:i*stride+line] for i in range( count ) )
+        chunk = self.compress.compress( raw )
+        if len( chunk ) > 0:
+            self.file.write( PNG_Chunk( b"IDAT", chunk ) )
+        self.rows += count
+    def Close( self ):
+        if self.file == None:
+            return
+        self.file.write( PNG_Chunk( b"IDAT", self.compress.flush() ) )
+        self.file.write( PNG_Chunk( b"IEND", b"" ) )
+        # Rows missing after a cancel shrink the image
+        if self.rows != self.height:
+            self.file.seek( len( png_signature ) )
+            self.file.write( self.Header( self.rows ) )
+        self.file.close()
+        self.file = None
+        self.compress = None
+        os.replace( self.temp, self.target )
+
+    #endregion
+
+
+class Sequence_APNG():
+    """
+    Animated PNG written one frame at a time
+    Frames arrive as PNG files of the same size and color type
+    """
+
+    #region Initialize
+
+    def __init__( self, target, count, fps, encode ):
+        # Variables
+        self.target = target
+        self.count = count
+        self.fps = max( 1, int( fps ) )
+        self.encode = encode # function( image ) returning PNG bytes
+        self.temp = target + ".part"
+        self.file = None
+        self.header = None
+        self.offset = 0 # position of acTL
+        self.sequence = 0
+        self.frames = 0
+
+    #endregion
+    #region Chunks
+
+    def Chunks( self, data ):
+        # ( type, data ) of a PNG file
+        if data[:8] != png_signature:
+            raise ValueError( "frame is not a PNG" )
+        index = 8
+        while index < len( data ):
+            length, kind = struct.unpack( ">I4s", data[index:index+8] )
+            yield kind, data[index+8:index+8+length]
+            index += 12 + length
+    def Chunk_Write( self, kind, data ):
+        self.file.write( PNG_Chunk( kind, data ) )
+
+    #endregion
+    #region Sequence
+
+    def Encode( self, image ):
+        return self.encode( image )
+    def Add( self, data ):
+        header = None
+        images = []
+        for kind, chunk in self.Chunks( data ):
+            if kind == b"IHDR":
+                header = chunk
+            elif kind == b"IDAT":
+                images.append( chunk )
+        # First frame opens the file
+        if self.file == None:
+            self.header = header
+            self.file = open( self.temp, "wb" )
+            self.file.write( png_signature )
+            self.Chunk_Write( b"IHDR", header )
+            self.offset = self.file.tell()
+            self.Chunk_Write( b"acTL", struct.pack( ">II", self.count, 0 ) )
+        elif header != self.header:
+            raise ValueError( "frames differ in size or color" )
+        # Frame control then its data ( the first frame is also the still image )
+        width, height = struct.unpack( ">II", header[:8] )
+        self.Chunk_Write( b"fcTL", struct.pack( ">IIIIIHHBB", self.sequence, width, height, 0, 0, 1, self.fps, 0, 0 ) )
+        self.sequence += 1
+        for chunk in images:
+            if self.frames == 0:
+                self.Chunk_Write( b"IDAT", chunk )
+            else:
+                self.Chunk_Write( b"fdAT", struct.pack( ">I", self.sequence ) + chunk )
+                self.sequence += 1
+        self.frames += 1
+    def Close( self ):
+        if self.file == None:
+            return
+        self.Chunk_Write( b"IEND", b"" )
+        # Frames missing after a cancel
+        if self.frames != self.count:
+            self.file.seek( self.offset )
+            self.Chunk_Write( b"acTL", struct.pack( ">II", self.frames, 0 ) )
+        self.file.close()
+        self.file = None
+        os.replace( self.temp, self.target )
+
+    #endregion
+
+
+class Frame_Pipeline():
+    """
+    Frames of an animation handed to encoder workers while the next one renders
+    Sequence outputs are encoded in parallel and assembled in frame order
+    """
+
+    #region Initialize
+
+    def __init__( self, engine, sequences=[] ):
+        # Variables
+        self.engine = engine # started Export_Engine
+        self.sequences = sequences # objects with Encode( image ), Add( data ), Close()
+        self.sequencer = concurrent.futures.ThreadPoolExecutor( max_workers=1 ) # keeps the frame order
+        self.futures = []
+        self.frames = 0
+        self.start = time.perf_counter()
+        self.render = 0 # seconds spent by the producer outside Push
+
+    #endregion
+    #region Pipeline
+
+    def Push( self, image, outputs, render=0 ):
+        # Returns once the frame is queued, blocks only while the window is full
+        self.frames += 1
+        self.render += render
+        self.futures.extend( self.engine.Fan_Out( image, outputs, wait=False ) )
+        for sequence in self.sequences:
+            self.engine.slots.acquire()
+            try:
+                encoded = self.engine.encoder.submit( sequence.Encode, image )
+                self.futures.append( self.sequencer.submit( self.Sequence_Add, sequence, encoded ) )
+            except Exception:
+                self.engine.slots.release()
+                raise
+    def Sequence_Add( self, sequence, encoded ):
+        try:
+            sequence.Add( encoded.result() )
+        finally:
+            self.engine.slots.release()
+    def Finish( self ):
+        failed = []
+        for future in self.futures:
+            try:future.result()
+            except Exception as e:failed.append( str( e ) )
+        for sequence in self.sequences:
+            try:self.sequencer.submit( sequence.Close ).result()
+            except Exception as e:failed.append( str( e ) )
+        self.sequencer.shutdown( wait=True )
+        seconds = time.perf_counter() - self.start
+        report = {
+            "frames" : self.frames,
+            "time" : seconds,
+            "render" : self.render,
+            "fps" : self.frames / seconds if seconds > 0 else 0,
+            "failed" : failed,
+            }
+        return report
+
+    #endregion
+
+
+class Export_Manifest():
+    """
+    Pages written to an export directory so a new export only redoes what changed
+    """
+
+    #region Initialize
+
+    def __init__( self, directory ):
+        # Variables
+        self.directory = directory
+        self.path = os.path.join( directory, export_manifest )
+        self.settings = None
+        self.pages = {} # { page : { "size", "mtime_ns", "digest", "outputs" : [ names ] } }
+        # Journal
+        self.journal_path = os.path.join( directory, export_journal )
+        self.journal = None
+        self.resumed = set()
+        self.Load()
+
+    def Load( self ):
+        try:
+            with open( self.path, "r", encoding="utf-8" ) as file:
+                data = json.load( file )
+            if data.get( "version", 0 ) <= export_version:
+                self.settings = data["settings"]
+                self.pages = data["pages"]
+        except ( OSError, ValueError, KeyError ):
+            self.settings = None
+            self.pages = {}
+    def Save( self ):
+        temp = self.path + ".part"
+        with open( temp, "w", encoding="utf-8" ) as file:
+            json.dump( { "version" : export_version, "settings" : self.settings, "pages" : self.pages }, file, indent=1 )
+        os.replace( temp, self.path )
+
+    #endregion
+    #region Journal
+
+    def Journal_Read( self ):
+        # Settings and finished pages of a run that did not end, a torn last line is ignored
+        settings = None
+        entries = []
+        try:
+            with open( self.journal_path, "r", encoding="utf-8" ) as file:
+                for line in file:
+                    try:data = json.loads( line )
+                    except ValueError:break
+                    if "settings" in data:
+                        settings = data["settings"]
+                        entries = []
+                    elif "page" in data:
+                        entries.append( data )
+        except OSError:
+            pass
+        return settings, entries
+    def Resume( self, settings ):
+        # Pages finished by an interrupted run with the same settings are not built again
+        journal_settings, entries = self.Journal_Read()
+        self.resumed = set()
+        if ( journal_settings == settings and len( entries ) > 0 ):
+            for data in entries:
+                self.Record( data["page"], ( data["size"], data["mtime_ns"] ), data.get( "digest", None ), data["outputs"] )
+                self.resumed.add( data["page"] )
+        return len( self.resumed )
+    def Journal_Start( self, settings ):
+        # Kept open in append mode, a resumed run continues the same journal
+        journal_settings, entries = self.Journal_Read()
+        if ( journal_settings == settings and len( self.resumed ) > 0 ):
+            self.journal = open( self.journal_path, "a", encoding="utf-8" )
+        else:
+            self.journal = open( self.journal_path, "w", encoding="utf-8" )
+            self.Journal_Write( { "version" : export_version, "settings" : settings } )
+    def Journal_Write( self, data ):
+        self.journal.write( json.dumps( data ) + "\n" )
+        self.journal.flush()
+        os.fsync( self.journal.fileno() )
+    def Journal_Add( self, page, key, outputs, digest=None ):
+        # Checkpoint of one finished page
+        self.Record( page, key, digest, outputs )
+        if self.journal != None:
+            self.Journal_Write( {
+                "page" : page,
+                "size" : key[0] if key != None else None,
+                "mtime_ns" : key[1] if key != None else None,
+                "digest" : digest,
+                "outputs" : sorted( outputs ),
+                } )
+    def Journal_Close( self ):
+        # Checkpoints stay on disk for the next run to resume after them
+        if self.journal != None:
+            self.journal.close()
+            self.journal = None
+    def Journal_End( self ):
+        # The manifest holds every checkpoint once saved
+        self.Journal_Close()
+        try:os.remove( self.journal_path )
+        except OSError:pass
+        self.resumed = set()
+
+    #endregion
+    #region Plan
+
+    def Outputs_Exist( self, entry ):
+        return ( len( entry["outputs"] ) > 0 and all( os.path.exists( os.path.join( self.directory, o ) ) for o in entry["outputs"] ) )
+    def Plan( self, pages, settings, digest=None ):
+        """
+        pages : { page : ( path, ( size, mtime_ns ) ) }
+        digest : function returning the content hash of a path ( asked only when the mtime changed )
+        """
+        build = []
+        skip = []
+        reasons = {}
+        same_settings = self.settings == settings
+        for page, ( path, key ) in pages.items():
+            entry = self.pages.get( page, None )
+            if entry == None:
+                reasons[page] = "new"
+            elif ( page in self.resumed and key != None and [ entry["size"], entry["mtime_ns"] ] == list( key ) and self.Outputs_Exist( entry ) == True ):
+                # Finished by the interrupted run
+                skip.append( page )
+                continue
+            elif same_settings == False:
+                reasons[page] = "settings"
+            elif self.Outputs_Exist( entry ) == False:
+                reasons[page] = "missing output"
+            elif ( key != None and [ entry["size"], entry["mtime_ns"] ] == list( key ) ):
+                skip.append( page )
+                continue
+            elif ( digest != None and entry.get( "digest", None ) != None and digest( path ) == entry["digest"] ):
+                # Touched but not changed
+                entry["size"], entry["mtime_ns"] = key if key != None else ( None, None )
+                skip.append( page )
+                continue
+            else:
+                reasons[page] = "changed"
+            build.append( page )
+        # Outputs of pages no longer in the project
+        removed = [ page for page in self.pages if page not in pages ]
+        plan = {
+            "build" : build,
+            "skip" : skip,
+            "removed" : removed,
+            "reasons" : reasons,
+            }
+        return plan
+
+    def Settings_Set( self, settings, built ):
+        # A cancelled run leaves pages of the old settings, they are forgotten so the next run builds them
+        if self.settings != settings:
+            for page in list( self.pages.keys() ):
+                if ( page not in built and page not in self.resumed ):
+                    self.pages.pop( page )
+        self.settings = settings
+
+    #endregion
+    #region Update
+
+    def Remove( self, page, keep=[] ):
+        # Deletes the outputs of a page except the ones kept
+        entry = self.pages.pop( page, None )
+        count = 0
+        if entry != None:
+            for name in entry["outputs"]:
+                if name in keep:
+                    continue
+                try:
+                    os.remove( os.path.join( self.directory, name ) )
+                    count += 1
+                except OSError:
+                    pass
+        return count
+    def Record( self, page, key, digest, outputs ):
+        # Outputs of an earlier export that are not written again are deleted
+        self.Remove( page, outputs )
+        self.pages[page] = {
+            "size" : key[0] if key != None else None,
+            "mtime_ns" : key[1] if key != None else None,
+            "digest" : digest,
+            "outputs" : sorted( outputs ),
+            }
+
+    #endregion
+
+
+class Export_Progress():
+    """
+    Current page, pages per second and time left of an export run
+    """
+
+    #region Initialize
+
+    def __init__( self ):
+        self.Start( 0 )
+
+    def Start( self, total ):
+        # Variables
+        self.total = total
+        self.done = 0
+        self.page = ""
+        self.start = time.perf_counter()
+
+    #endregion
+    #region Status
+
+    def Step( self, page, count=1 ):
+        self.done += count
+        self.page = page
+        return self.Status()
+    def Status( self ):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0
+        eta = ( self.total - self.done ) / rate if rate > 0 else None
+        status = {
+            "page" : self.page,
+            "done" : self.done,
+            "total" : self.total,
+            "rate" : rate,
+            "eta" : eta,
+            "time" : elapsed,
+            }
+        return status
+
+    #endregion
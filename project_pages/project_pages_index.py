@@ -0,0 +1,457 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import time
+import hashlib
+import fnmatch
+import concurrent.futures
+
+#endregion
+#region Global Variables
+
+# Hash
+hash_block = 1024 * 1024 # bytes read per cycle
+
+#endregion
+#region Functions
+
+def File_Open( path ):
+    return open( path, "rb" )
+def Stream_Hash( file ):
+    digest = hashlib.blake2b( digest_size=20 )
+    while True:
+        block = file.read( hash_block )
+        if not block:
+            break
+        digest.update( block )
+    return digest.hexdigest()
+
+#endregion
+
+
+class Index_Content():
+    """
+    Content hashes of pages so the same image is only imported once
+    """
+
+    #region Initialize
+
+    def __init__( self, workers=None ):
+        # Variables
+        self.workers = workers if workers != None else min( 8, os.cpu_count() or 1 )
+        # Cache { path : ( size, mtime_ns, digest ) }
+        self.cache = {}
+
+    def Clear( self ):
+        self.cache = {}
+
+    #endregion
+    #region Hash
+
+    def Hash( self, path, opener=File_Open ):
+        # Cached while the file does not change
+        try:
+            stat = os.stat( path )
+            key = ( stat.st_size, stat.st_mtime_ns )
+        except OSError:
+            key = None
+        cached = self.cache.get( path, None )
+        if ( key != None and cached != None and cached[:2] == key ):
+            return cached[2]
+        with opener( path ) as file:
+            digest = Stream_Hash( file )
+        if key != None:
+            self.cache[path] = ( key[0], key[1], digest )
+        return digest
+    def Hash_Many( self, paths, opener=File_Open, progress=None ):
+        # Streaming reads in a worker pool ( hashlib and file reads release the GIL )
+        digests = {}
+        if len( paths ) == 0:
+            return digests
+        with concurrent.futures.ThreadPoolExecutor( max_workers=self.workers ) as executor:
+            futures = { executor.submit( self.Hash, path, opener ) : path for path in paths }
+            index = 0
+            for future in concurrent.futures.as_completed( futures ):
+                path = futures[future]
+                try:digests[path] = future.result()
+                except OSError:digests[path] = None
+                index += 1
+                if progress != None:
+                    progress( index, len( paths ) )
+        return digests
+
+    #endregion
+    #region Import
+
+    def Import_Plan( self, sources, existing, opener=File_Open, progress=None ):
+        """
+        sources : paths to import
+        existing : { path : size } of the project pages
+        """
+        # Sizes ( only files sharing a size can be duplicates )
+        source_size = {}
+        for path in sources:
+            try:source_size[path] = os.path.getsize( path )
+            except OSError:source_size[path] = None
+        count = {}
+        for size in list( source_size.values() ) + list( existing.values() ):
+            count[size] = count.get( size, 0 ) + 1
+        candidates_source = [ p for p in sources if source_size[p] != None and count[source_size[p]] > 1 ]
+        candidates_existing = [ p for p, size in existing.items() if count.get( size, 0 ) > 1 ]
+
+        # Hashes
+        digests = self.Hash_Many( candidates_existing, opener, progress )
+        digests.update( self.Hash_Many( candidates_source, File_Open, progress ) )
+        known = {}
+        for path in candidates_existing:
+            if digests.get( path, None ) != None:
+                known[digests[path]] = path
+
+        # Plan
+        unique = []
+        duplicates = [] # ( source, original )
+        saved = 0
+        for path in sources:
+            digest = digests.get( path, None )
+            if ( digest != None and digest in known ):
+                duplicates.append( ( path, known[digest] ) )
+                saved += source_size[path]
+            else:
+                unique.append( path )
+                if digest != None:
+                    known[digest] = path
+        plan = {
+            "unique" : unique,
+            "duplicates" : duplicates,
+            "bytes_saved" : saved,
+            }
+        return plan
+
+    #endregion
+
+
+class Index_Project():
+    """
+    Files of the project folders updated by deltas instead of full listings
+    """
+
+    #region Initialize
+
+    def __init__( self ):
+        # Folders { name : { "path", "filters", "exclude", "entries" : { file : ( size, mtime_ns ) } } }
+        self.folders = {}
+        self.dirty = set()
+        # Snapshots are rebuilt only when the version changes
+        self.version = 0
+        self.snapshots = {} # { name : ( version, paths ) }
+
+    def Clear( self ):
+        self.folders = {}
+        self.dirty = set()
+        self.snapshots = {}
+        self.version += 1
+
+    #endregion
+    #region Folders
+
+    def Folder_Add( self, name, path, filters=[], exclude=[] ):
+        self.folders[name] = {
+            "path" : path,
+            "filters" : [ f.lower() for f in filters ],
+            "exclude" : [ e.lower() for e in exclude ],
+            "entries" : {},
+            }
+        self.dirty.add( name )
+    def Folder_Match( self, folder, name ):
+        lowered = name.lower()
+        if any( lowered.endswith( e ) for e in folder["exclude"] ):
+            return False
+        return ( len( folder["filters"] ) == 0 or any( fnmatch.fnmatch( lowered, f ) for f in folder["filters"] ) )
+    def Folder_Scan( self, name ):
+        # Delta between the folder and the entries known
+        folder = self.folders[name]
+        entries = {}
+        try:
+            with os.scandir( folder["path"] ) as scan:
+                for entry in scan:
+                    if ( entry.is_file( follow_symlinks=False ) == True and self.Folder_Match( folder, entry.name ) == True ):
+                        stat = entry.stat( follow_symlinks=False )
+                        entries[entry.name] = ( stat.st_size, stat.st_mtime_ns )
+        except OSError:
+            pass
+        old = folder["entries"]
+        delta = {
+            "added" : [ n for n in entries if n not in old ],
+            "removed" : [ n for n in old if n not in entries ],
+            "modified" : [ n for n in entries if n in old and old[n] != entries[n] ],
+            }
+        folder["entries"] = entries
+        if ( len( delta["added"] ) > 0 or len( delta["removed"] ) > 0 or len( delta["modified"] ) > 0 ):
+            self.version += 1
+        return delta
+
+    def Dirty( self, name=None ):
+        # Folders to scan on the next flush ( all when name is None )
+        if name == None:
+            self.dirty.update( self.folders.keys() )
+        elif name in self.folders:
+            self.dirty.add( name )
+    def Dirty_Path( self, path ):
+        # Folder of a watcher notification
+        for name, folder in self.folders.items():
+            if os.path.normpath( folder["path"] ) == os.path.normpath( path ):
+                self.dirty.add( name )
+                return name
+        return None
+    def Flush( self ):
+        # Scans only the folders marked dirty, nothing when none changed
+        deltas = {}
+        for name in list( self.dirty ):
+            if name in self.folders:
+                deltas[name] = self.Folder_Scan( name )
+        self.dirty = set()
+        return deltas
+    def Entry( self, name, path ):
+        # ( size, mtime_ns ) of a file as last scanned
+        folder = self.folders.get( name, None )
+        if folder == None:
+            return None
+        return folder["entries"].get( os.path.basename( path ), None )
+    def Touch( self ):
+        # Something outside the folders changed ( like pages still inside the archive )
+        self.version += 1
+
+    #endregion
+    #region Snapshot
+
+    def Paths( self, name, extra=None, key=None ):
+        """
+        Immutable tuple of full paths of a folder
+        extra : function returning paths to merge ( Lazy Open pages )
+        key : sort key of a path
+        """
+        snapshot = self.snapshots.get( name, None )
+        if ( snapshot != None and snapshot[0] == self.version ):
+            return snapshot[1]
+        folder = self.folders.get( name, None )
+        paths = []
+        if folder != None:
+            paths = [ os.path.normpath( os.path.join( folder["path"], n ) ) for n in folder["entries"] ]
+            if extra != None:
+                known = set( paths )
+                paths += [ p for p in extra() if p not in known and self.Folder_Match( folder, os.path.basename( p ) ) ]
+        paths.sort( key=key )
+        paths = tuple( paths )
+        self.snapshots[name] = ( self.version, paths )
+        return paths
+
+    #endregion
+
+
+class Page_Record():
+    """
+    One page of the project with the files that belong to it
+    """
+
+    __slots__ = ( "name", "basename", "image", "backup", "text", "text_index", "stat", "open" )
+
+    def __init__( self, image ):
+        self.basename = os.path.basename( image ) # name.kra
+        self.name = os.path.splitext( self.basename )[0] # name
+        self.image = image
+        self.backup = image + "~"
+        self.text = None
+        self.text_index = -1 # index in the texts list
+        self.stat = None # ( size, mtime_ns ) of the image
+        self.open = False # open as a Krita document
+
+
+class Page_Registry():
+    """
+    Records of the pages indexed by name, basename and path
+    """
+
+    #region Initialize
+
+    def __init__( self ):
+        # Variables
+        self.version = None
+        self.pages = {} # { name : record }
+        self.basenames = {} # { basename : record }
+        self.paths = {} # { path : record }
+
+    def Clear( self ):
+        self.version = None
+        self.pages = {}
+        self.basenames = {}
+        self.paths = {}
+
+    #endregion
+    #region Build
+
+    def Build( self, version, images, texts, stat=None ):
+        """
+        Rebuilt only when the project index version changes
+        stat : function returning ( size, mtime_ns ) of an image path
+        """
+        if ( version != None and version == self.version ):
+            return False
+        opened = set( path for path, record in self.paths.items() if record.open == True )
+        pages = {}
+        basenames = {}
+        paths = {}
+        for image in images:
+            record = Page_Record( image )
+            if stat != None:
+                record.stat = stat( image )
+            path = os.path.normpath( image )
+            record.open = path in opened
+            pages[record.name] = record
+            basenames[record.basename] = record
+            paths[path] = record
+        for index in range( 0, len( texts ) ):
+            name = os.path.splitext( os.path.basename( texts[index] ) )[0]
+            record = pages.get( name, None )
+            if record != None:
+                record.text = texts[index]
+                record.text_index = index
+        self.version = version
+        self.pages = pages
+        self.basenames = basenames
+        self.paths = paths
+        return True
+
+    #endregion
+    #region Lookup
+
+    def Page( self, basename ):
+        return self.basenames.get( basename, None )
+    def Page_Name( self, name ):
+        return self.pages.get( name, None )
+    def Page_Path( self, path ):
+        return self.paths.get( os.path.normpath( path ), None )
+    def Documents( self, paths ):
+        # Marks the pages open in Krita and returns them
+        for record in self.paths.values():
+            record.open = False
+        records = []
+        for path in paths:
+            record = self.paths.get( os.path.normpath( path ), None )
+            if record != None:
+                record.open = True
+                records.append( record )
+        return records
+
+    #endregion
+
+
+class Note_Buffer():
+    """
+    Notes kept in memory and written to disk only when they changed
+    """
+
+    #region Initialize
+
+    def __init__( self, reader=None, writer=None ):
+        # Variables
+        self.reader = reader # function returning the text of a key
+        self.writer = writer # function writing { key : text } at once, False on failure ( files when None )
+        self.notes = {} # { key : text }
+        self.dirty = set()
+        self.Stats_Reset()
+
+    def Clear( self ):
+        self.notes = {}
+        self.dirty = set()
+    def Stats_Reset( self ):
+        self.reads_memory = 0
+        self.reads_disk = 0
+        self.flushes = 0
+        self.writes = 0
+        self.time_last = 0
+        self.time_total = 0
+
+    #endregion
+    #region Notes
+
+    def Read( self, path ):
+        path = os.path.normpath( path )
+        if path in self.notes:
+            self.reads_memory += 1
+            return self.notes[path]
+        self.reads_disk += 1
+        text = self.reader( path ) if self.reader != None else ""
+        self.notes[path] = text
+        return text
+    def Write( self, path, text ):
+        # Returns True when the note changed
+        path = os.path.normpath( path )
+        if self.notes.get( path, None ) == text:
+            return False
+        self.notes[path] = text
+        self.dirty.add( path )
+        return True
+    def Forget( self, path ):
+        # Drops a clean note so the next read comes from disk
+        path = os.path.normpath( path )
+        if path not in self.dirty:
+            self.notes.pop( path, None )
+    def Flush( self ):
+        # Writes the dirty notes aside and swaps them in
+        if len( self.dirty ) == 0:
+            return 0
+        start = time.perf_counter()
+        count = 0
+        if self.writer != None:
+            # A writer that fails keeps the notes dirty for the next flush
+            notes = { key : self.notes[key] for key in self.dirty }
+            if self.writer( notes ) != False:
+                count = len( notes )
+                self.dirty.difference_update( notes )
+        else:
+            for path in list( self.dirty ):
+                try:
+                    temp = path + ".part"
+                    with open( temp, "w" ) as note:
+                        note.write( self.notes[path] )
+                    os.replace( temp, path )
+                    count += 1
+                except OSError:
+                    continue
+                self.dirty.discard( path )
+        self.flushes += 1
+        self.writes += count
+        self.time_last = time.perf_counter() - start
+        self.time_total += self.time_last
+        return count
+    def Stats( self ):
+        stats = {
+            "reads_memory" : self.reads_memory,
+            "reads_disk" : self.reads_disk,
+            "flushes" : self.flushes,
+            "writes" : self.writes,
+            "dirty" : len( self.dirty ),
+            "time_last" : self.time_last,
+            "time_average" : self.time_total / self.flushes if self.flushes > 0 else 0,
+            }
+        return stats
+
+    #endregion
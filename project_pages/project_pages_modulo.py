@@ -0,0 +1,897 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import json
+import math
+import gzip
+import zipfile
+import hashlib
+import threading
+import collections
+# Krita Module
+from krita import *
+# PyQt5 Modules
+from PyQt5 import QtWidgets, QtCore, QtGui
+try:from PyQt5 import QtSvg
+except ImportError:QtSvg = None
+# Project Modules
+from .project_pages_export import *
+
+#endregion
+#region Global Variables
+
+# Embedded previews from the smallest to the largest
+preview_members = {
+    ".kra" : [ "preview.png", "mergedimage.png" ],
+    ".krz" : [ "preview.png", "mergedimage.png" ],
+    ".ora" : [ "Thumbnails/thumbnail.png", "mergedimage.png" ],
+    }
+
+#endregion
+#region Functions
+
+def Thumbnail_Render( qimage, size, color, mode=QtCore.Qt.KeepAspectRatioByExpanding ):
+    # Square icon with the image centered ( QImage only so it runs in any thread )
+    bg = QtGui.QImage( size, size, QtGui.QImage.Format_ARGB32_Premultiplied )
+    bg.fill( color )
+    if qimage.isNull() == False:
+        pix = qimage.scaled( size, size, mode, QtCore.Qt.SmoothTransformation )
+        px = int( ( size * 0.5 ) - ( pix.width() * 0.5 ) )
+        py = int( ( size * 0.5 ) - ( pix.height() * 0.5 ) )
+        painter = QtGui.QPainter( bg )
+        painter.drawImage( px, py, pix )
+        painter.end()
+    return bg
+
+#endregion
+
+
+class Worker_Save( QtCore.QThread ):
+    """
+    Writes the Project ZIP outside the GUI thread
+    """
+    SIGNAL_PROGRESS = QtCore.pyqtSignal( int, int )
+    SIGNAL_FINISH = QtCore.pyqtSignal( dict )
+
+    #region Initialize
+
+    def __init__( self, archive, directory, destination, snapshot=None, parent=None ):
+        super( Worker_Save, self ).__init__( parent )
+        self.archive = archive
+        self.directory = directory
+        self.destination = destination
+        self.snapshot = snapshot
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        try:
+            report = self.archive.Save( self.directory, self.destination, self.Progress )
+        except Exception as e:
+            report = { "error" : str( e ) }
+        # Version of the saved ZIP
+        if ( self.snapshot != None and "error" not in report ):
+            try:report["snapshot"] = self.snapshot.Snapshot( self.destination, "save" )
+            except Exception as e:report["snapshot"] = { "error" : str( e ) }
+        self.SIGNAL_FINISH.emit( report )
+    def Progress( self, index, total ):
+        self.SIGNAL_PROGRESS.emit( index, total )
+
+    #endregion
+
+
+class Worker_Search( QtCore.QThread ):
+    """
+    Runs a file search outside the GUI thread
+    """
+    SIGNAL_BATCH = QtCore.pyqtSignal( list )
+    SIGNAL_COUNT = QtCore.pyqtSignal( int, int )
+    SIGNAL_IMPORT = QtCore.pyqtSignal( int, int )
+    SIGNAL_FINISH = QtCore.pyqtSignal( dict )
+
+    #region Initialize
+
+    def __init__( self, search, parent=None, importer=None ):
+        super( Worker_Search, self ).__init__( parent )
+        self.search = search
+        self.importer = importer # Search_Import fed with each batch
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        if self.importer != None:
+            self.importer.progress = self.SIGNAL_IMPORT.emit
+        try:
+            report = self.search.Run( self.Batch, self.SIGNAL_COUNT.emit )
+        except Exception as e:
+            report = { "error" : str( e ), "found" : [], "scanned" : self.search.scanned, "cancelled" : False }
+        if self.importer != None:
+            report["import"] = self.importer.Finish()
+        self.SIGNAL_FINISH.emit( report )
+    def Batch( self, batch ):
+        self.SIGNAL_BATCH.emit( batch )
+        if self.importer != None:
+            self.importer.Add( batch )
+
+    #endregion
+
+
+class Worker_Import( QtCore.QThread ):
+    """
+    Checks duplicates and copies imported pages outside the GUI thread
+    """
+    SIGNAL_PROGRESS = QtCore.pyqtSignal( int, int )
+    SIGNAL_FINISH = QtCore.pyqtSignal( dict )
+
+    #region Initialize
+
+    def __init__( self, importer, sources, batch=16, parent=None ):
+        super( Worker_Import, self ).__init__( parent )
+        self.importer = importer # Search_Import
+        self.sources = sources
+        self.batch = batch # files per step of the progress bar
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        self.importer.progress = self.SIGNAL_PROGRESS.emit
+        for i in range( 0, len( self.sources ), self.batch ):
+            self.importer.Add( self.sources[i:i + self.batch] )
+        self.SIGNAL_FINISH.emit( self.importer.Finish() )
+
+    #endregion
+
+
+class Worker_Export( QtCore.QThread ):
+    """
+    Runs the static pages of an export outside the GUI thread
+    """
+    SIGNAL_PAGE = QtCore.pyqtSignal( str, list, str, object )
+    SIGNAL_FINISH = QtCore.pyqtSignal( dict )
+
+    #region Initialize
+
+    def __init__( self, engine, jobs, parent=None ):
+        super( Worker_Export, self ).__init__( parent )
+        self.engine = engine
+        self.jobs = jobs
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        try:
+            report = self.engine.Run( self.jobs, None, self.SIGNAL_PAGE.emit )
+        except Exception as e:
+            report = { "error" : str( e ), "exported" : [], "documents" : [], "digests" : {}, "failed" : [], "cancelled" : True, "time" : 0 }
+        self.SIGNAL_FINISH.emit( report )
+
+    #endregion
+
+
+class Sequence_Sheet():
+    """
+    Sprite sheet of an animation painted one frame at a time
+    Only the current row of cells is held in memory, finished rows are streamed to the PNG
+    """
+
+    #region Initialize
+
+    def __init__( self, target, count, convert ):
+        # Variables
+        self.target = target
+        self.count = count
+        self.convert = convert # function( qimage ) returning the frame as drawn in the sheet
+        self.columns = max( 1, math.ceil( math.sqrt( count ) ) )
+        self.rows = max( 1, math.ceil( count / self.columns ) )
+        self.width = 0 # cell size
+        self.height = 0
+        self.stream = None
+        self.band = None # current row of cells
+        self.painter = None
+        self.frames = 0
+
+    #endregion
+    #region Sequence
+
+    def Encode( self, qimage ):
+        return self.convert( qimage )
+    def Add( self, qimage ):
+        # First frame sets the cell size
+        if self.stream == None:
+            self.width = qimage.width()
+            self.height = qimage.height()
+            self.stream = PNG_Stream( self.target, self.width * self.columns, self.height * self.rows )
+            self.stream.Open()
+        if self.band == None:
+            self.band = QtGui.QImage( self.width * self.columns, self.height, QtGui.QImage.Format_ARGB32_Premultiplied )
+            self.band.fill( QtCore.Qt.transparent )
+            self.painter = QtGui.QPainter( self.band )
+        x = ( self.frames % self.columns ) * self.width
+        self.painter.drawImage( x, 0, qimage )
+        self.frames += 1
+        if self.frames % self.columns == 0:
+            self.Band_Write()
+    def Band_Write( self ):
+        # Finished row of cells as RGBA scanlines
+        self.painter.end()
+        band = self.band.convertToFormat( QtGui.QImage.Format_RGBA8888 )
+        stride = band.bytesPerLine()
+        self.stream.Rows( band.constBits().asstring( stride * band.height() ), stride )
+        self.band = None
+        self.painter = None
+    def Close( self ):
+        if self.stream == None:
+            return
+        if self.band != None:
+            self.Band_Write()
+        self.stream.Close()
+        self.stream = None
+
+    #endregion
+
+
+class Thumbnail_Cache():
+    """
+    Page icons kept in memory and on disk so unchanged pages are not decoded again
+    """
+
+    #region Initialize
+
+    def __init__( self, directory, budget=64*1024*1024, memory=512 ):
+        # Variables
+        self.directory = directory
+        self.budget = budget # bytes on disk
+        self.memory = memory # icons in memory
+        self.lock = threading.Lock()
+        # Memory LRU { key : QImage }
+        self.images = collections.OrderedDict()
+        # Disk { file : size } read on first use, least recently used first
+        self.files = None
+        self.files_size = 0
+        # Statistics
+        self.Stats_Reset()
+
+    def Stats_Reset( self ):
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    #endregion
+    #region Cache
+
+    def Get( self, key, disk=True ):
+        with self.lock:
+            # Memory
+            if key in self.images:
+                self.images.move_to_end( key )
+                self.hits_memory += 1
+                return self.images[key]
+            if disk == False:
+                return None
+        # Disk ( read outside the lock so the GUI thread never waits on it )
+        self.Disk_Load()
+        name = self.Disk_Name( key )
+        with self.lock:
+            known = name in self.files
+            if known == True:
+                self.files.move_to_end( name ) # recently used
+        if known == True:
+            path = os.path.join( self.directory, name )
+            qimage = QtGui.QImage( path, "PNG" )
+            if qimage.isNull() == False:
+                try:os.utime( path ) # order kept for the next session
+                except OSError:pass
+                with self.lock:
+                    self.Memory_Put( key, qimage )
+                    self.hits_disk += 1
+                return qimage
+            with self.lock:
+                evicted = self.Disk_Forget( name )
+            self.Disk_Delete( evicted )
+        with self.lock:
+            self.misses += 1
+        return None
+    def Put( self, key, qimage ):
+        with self.lock:
+            self.Memory_Put( key, qimage )
+        self.Disk_Load()
+        name = self.Disk_Name( key )
+        path = os.path.join( self.directory, name )
+        temp = f"{ path }.{ threading.get_ident() }.part"
+        try:
+            os.makedirs( self.directory, exist_ok=True )
+            if qimage.save( temp, "PNG" ) == True:
+                os.replace( temp, path )
+                size = os.path.getsize( path )
+                with self.lock:
+                    self.files_size -= self.files.pop( name, 0 )
+                    self.files[name] = size
+                    self.files_size += size
+                    evicted = self.Disk_Evict()
+                self.Disk_Delete( evicted )
+        except OSError:
+            pass
+    def Clear( self ):
+        with self.lock:
+            self.images.clear()
+
+    def Memory_Put( self, key, qimage ):
+        self.images[key] = qimage
+        self.images.move_to_end( key )
+        while len( self.images ) > self.memory:
+            self.images.popitem( last=False )
+
+    def Disk_Name( self, key ):
+        return hashlib.sha1( repr( key ).encode( "utf-8" ) ).hexdigest() + ".png"
+    def Disk_Load( self ):
+        # Scanned once, oldest first, then kept up to date by Put and Get
+        if self.files != None:
+            return
+        entries = []
+        if os.path.isdir( self.directory ) == True:
+            for entry in os.scandir( self.directory ):
+                if ( entry.is_file() == True and entry.name.endswith( ".png" ) ):
+                    try:
+                        stat = entry.stat()
+                        entries.append( ( stat.st_mtime, entry.name, stat.st_size ) )
+                    except OSError:
+                        pass
+        entries.sort()
+        files = collections.OrderedDict( ( name, size ) for stamp, name, size in entries )
+        with self.lock:
+            if self.files == None:
+                self.files = files
+                self.files_size = sum( files.values() )
+    def Disk_Forget( self, name ):
+        # Lock held, returns the names to delete
+        if name in self.files:
+            self.files_size -= self.files.pop( name )
+            return [ name ]
+        return []
+    def Disk_Evict( self ):
+        # Lock held, least recently used files go first until the budget is met
+        evicted = []
+        while ( self.files_size > self.budget and len( self.files ) > 1 ):
+            name, size = self.files.popitem( last=False )
+            self.files_size -= size
+            evicted.append( name )
+        return evicted
+    def Disk_Delete( self, names ):
+        for name in names:
+            try:os.remove( os.path.join( self.directory, name ) )
+            except OSError:pass
+
+    #endregion
+
+
+class Preview_Registry():
+    """
+    Icon sized images read by the cheapest extractor of each format
+    """
+
+    #region Initialize
+
+    def __init__( self, pool=None ):
+        # Shared ZIP readers ( Archive_Pool ) for documents on disk
+        self.pool = pool
+        # Extractors { extension : function( source, extension, size ) }
+        self.extractors = {}
+        for extension in preview_members:
+            self.Register( extension, self.Preview_Container )
+        for extension in ( ".svg", ".svgz" ):
+            self.Register( extension, self.Preview_SVG )
+
+    def Register( self, extension, function ):
+        self.extractors[extension.lower()] = function
+
+    #endregion
+    #region Preview
+
+    def Image( self, source, extension, size ):
+        """
+        source : path or seekable binary file
+        Returns a QImage covering size x size, null when nothing could be read
+        """
+        extension = extension.lower()
+        qimage = QtGui.QImage()
+        function = self.extractors.get( extension, self.Preview_Reader )
+        try:qimage = function( source, extension, size )
+        except Exception:qimage = QtGui.QImage()
+        # Full Decode
+        if qimage.isNull() == True:
+            qimage = self.Preview_Full( source, extension )
+        return qimage
+
+    def Preview_Container( self, source, extension, size ):
+        # Krita and OpenRaster documents carry their own previews
+        if ( self.pool != None and isinstance( source, str ) ):
+            return self.Preview_Members( self.pool.Names( source ), lambda name: self.pool.Read( source, name ), extension, size )
+        with zipfile.ZipFile( source, "r" ) as document:
+            return self.Preview_Members( document.namelist(), document.read, extension, size )
+    def Preview_Members( self, names, read, extension, size ):
+        names = set( names )
+        largest = None
+        for name in preview_members[extension]:
+            if name not in names:
+                continue
+            data = read( name )
+            reader, buffer = self.Reader_Data( data )
+            preview = reader.size()
+            largest = data
+            if ( preview.isValid() == True and min( preview.width(), preview.height() ) >= size ):
+                return self.Reader_Scaled( reader, size )
+        if largest != None:
+            reader, buffer = self.Reader_Data( largest )
+            return self.Reader_Scaled( reader, size )
+        return QtGui.QImage()
+    def Preview_Reader( self, source, extension, size ):
+        # JPEG and PNG decoders downscale while decoding
+        if isinstance( source, str ):
+            reader = QtGui.QImageReader( source )
+            return self.Reader_Scaled( reader, size )
+        reader, buffer = self.Reader_Data( source.read() )
+        return self.Reader_Scaled( reader, size )
+    def Preview_SVG( self, source, extension, size ):
+        # Vectors are drawn straight at icon size
+        if QtSvg == None:
+            return QtGui.QImage()
+        if isinstance( source, str ):
+            with open( source, "rb" ) as file:
+                data = file.read()
+        else:
+            data = source.read()
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress( data )
+        renderer = QtSvg.QSvgRenderer( QtCore.QByteArray( data ) )
+        if renderer.isValid() == False:
+            return QtGui.QImage()
+        view = renderer.defaultSize()
+        if view.isEmpty() == True:
+            view = QtCore.QSize( size, size )
+        factor = max( size / view.width(), size / view.height() )
+        qimage = QtGui.QImage( math.ceil( view.width() * factor ), math.ceil( view.height() * factor ), QtGui.QImage.Format_ARGB32_Premultiplied )
+        qimage.fill( QtCore.Qt.transparent )
+        painter = QtGui.QPainter( qimage )
+        renderer.render( painter )
+        painter.end()
+        return qimage
+    def Preview_Full( self, source, extension ):
+        if isinstance( source, str ):
+            return QtGui.QImage( source )
+        source.seek( 0 )
+        qimage = QtGui.QImage()
+        qimage.loadFromData( source.read() )
+        return qimage
+
+    def Reader_Data( self, data ):
+        # The buffer is returned too since the reader does not own it
+        buffer = QtCore.QBuffer()
+        buffer.setData( QtCore.QByteArray( data ) )
+        buffer.open( QtCore.QIODevice.ReadOnly )
+        reader = QtGui.QImageReader( buffer )
+        return reader, buffer
+    def Reader_Scaled( self, reader, size ):
+        # Smallest image that still covers size x size
+        original = reader.size()
+        if original.isValid() == True:
+            factor = max( size / original.width(), size / original.height() )
+            if factor < 1:
+                reader.setScaledSize( QtCore.QSize( math.ceil( original.width() * factor ), math.ceil( original.height() * factor ) ) )
+        return reader.read()
+
+    #endregion
+
+
+class Thumbnail_Signals( QtCore.QObject ):
+    """
+    Results of the thumbnail jobs delivered to the GUI thread
+    """
+    SIGNAL_IMAGE = QtCore.pyqtSignal( int, str, object, QtGui.QImage )
+
+    #region Initialize
+
+    def __init__( self, parent=None ):
+        super( Thumbnail_Signals, self ).__init__( parent )
+        # Jobs of an older generation are stale
+        self.generation = 0
+        # Paths being decoded by a started job
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def Running( self ):
+        with self.lock:
+            return set( self.running )
+
+    #endregion
+
+class Thumbnail_Job( QtCore.QRunnable ):
+    """
+    Decodes one page icon in the thread pool
+    """
+
+    #region Initialize
+
+    def __init__( self, signals, path, key, size, color, cache, preview, pool=None, archive=None, arcname=None ):
+        super( Thumbnail_Job, self ).__init__()
+        self.signals = signals
+        self.generation = signals.generation
+        self.path = path
+        self.key = key
+        self.size = size
+        self.color = color
+        self.cache = cache
+        self.preview = preview # Preview_Registry
+        # Lazy page still inside the project ZIP ( read through the thread safe Archive_Pool )
+        self.pool = pool
+        self.archive = archive
+        self.arcname = arcname
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        if self.generation != self.signals.generation:
+            return
+        with self.signals.lock:
+            self.signals.running.add( self.path )
+        try:
+            qimage = self.cache.Get( self.key ) if self.key != None else None
+            if qimage == None:
+                source = self.Preview()
+                qimage = Thumbnail_Render( source, self.size, self.color )
+                if ( self.key != None and source.isNull() == False ):
+                    self.cache.Put( self.key, qimage )
+        except Exception:
+            qimage = QtGui.QImage() # the request is still answered so it can be made again
+        finally:
+            with self.signals.lock:
+                self.signals.running.discard( self.path )
+        if self.generation == self.signals.generation:
+            self.signals.SIGNAL_IMAGE.emit( self.generation, self.path, self.key, qimage )
+    def Preview( self ):
+        extension = os.path.splitext( self.path )[1]
+        if os.path.exists( self.path ) == True:
+            return self.preview.Image( self.path, extension, self.size )
+        if ( self.pool != None and self.archive != None ):
+            with self.pool.File( self.archive, self.arcname ) as file:
+                return self.preview.Image( file, extension, self.size )
+        return QtGui.QImage()
+
+    #endregion
+
+class Pages_Model( QtCore.QAbstractListModel ):
+    """
+    Page list rows fetched in batches with icons asked only for the rows drawn
+    """
+
+    #region Initialize
+
+    def __init__( self, cache, request, batch=200, memory=256, parent=None ):
+        super( Pages_Model, self ).__init__( parent )
+        # Variables
+        self.cache = cache # Thumbnail_Cache
+        self.request = request # function( path, key ) queues the icon of a row
+        self.batch = batch
+        self.memory = memory
+        self.placeholder = QtGui.QPixmap()
+        # Rows
+        self.paths = [] # every page in order
+        self.rows = None # { path : row } rebuilt after the rows change
+        self.keys = {} # { path : key of the icon }
+        self.loaded = 0 # rows handed to the view
+        self.highlight = set() # paths matching the note search
+        self.highlight_color = QtGui.QColor( 255, 200, 0, 90 )
+        # Pixmaps LRU { path : QPixmap }
+        self.pixmaps = collections.OrderedDict()
+
+    #endregion
+    #region Model
+
+    def rowCount( self, parent=QtCore.QModelIndex() ):
+        if parent.isValid() == True:
+            return 0
+        return self.loaded
+    def canFetchMore( self, parent=QtCore.QModelIndex() ):
+        return ( parent.isValid() == False and self.loaded < len( self.paths ) )
+    def fetchMore( self, parent=QtCore.QModelIndex() ):
+        if parent.isValid() == True:
+            return
+        count = min( self.batch, len( self.paths ) - self.loaded )
+        if count > 0:
+            self.beginInsertRows( QtCore.QModelIndex(), self.loaded, self.loaded + count - 1 )
+            self.loaded += count
+            self.endInsertRows()
+    def data( self, index, role=QtCore.Qt.DisplayRole ):
+        if ( index.isValid() == False or index.row() >= self.loaded ):
+            return None
+        path = self.paths[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return os.path.basename( path )
+        if role == QtCore.Qt.DecorationRole:
+            return self.Pixmap( path )
+        if role == QtCore.Qt.UserRole:
+            return path
+        if ( role == QtCore.Qt.BackgroundRole and path in self.highlight ):
+            return QtGui.QBrush( self.highlight_color )
+        return None
+    def flags( self, index ):
+        if index.isValid() == False:
+            return QtCore.Qt.ItemIsDropEnabled
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsDragEnabled
+    def supportedDropActions( self ):
+        return QtCore.Qt.MoveAction
+    def moveRows( self, source_parent, source_row, count, destination_parent, destination_row ):
+        # Drag and drop order ( used by Rename )
+        if ( source_parent.isValid() == True or destination_parent.isValid() == True ):
+            return False
+        if source_row <= destination_row <= source_row + count:
+            return False
+        if self.beginMoveRows( QtCore.QModelIndex(), source_row, source_row + count - 1, QtCore.QModelIndex(), destination_row ) == False:
+            return False
+        moved = self.paths[source_row:source_row + count]
+        del self.paths[source_row:source_row + count]
+        if destination_row > source_row:
+            destination_row -= count
+        self.paths[destination_row:destination_row] = moved
+        self.rows = None
+        self.endMoveRows()
+        return True
+
+    #endregion
+    #region Icons
+
+    def Pixmap( self, path ):
+        if path in self.pixmaps:
+            self.pixmaps.move_to_end( path )
+            return self.pixmaps[path]
+        key = self.keys.get( path, None )
+        qimage = self.cache.Get( key, False ) if key != None else None
+        if qimage != None:
+            return self.Pixmap_Put( path, QtGui.QPixmap.fromImage( qimage ) )
+        self.request( path, key )
+        return self.placeholder
+    def Pixmap_Put( self, path, pixmap ):
+        self.pixmaps[path] = pixmap
+        while len( self.pixmaps ) > self.memory:
+            self.pixmaps.popitem( last=False )
+        return pixmap
+    def Icon_Set( self, path, key, qimage ):
+        # A failed decode keeps the placeholder and is asked again the next time the row is drawn
+        if ( self.keys.get( path, None ) != key or qimage.isNull() == True ):
+            return
+        self.Pixmap_Put( path, QtGui.QPixmap.fromImage( qimage ) )
+        row = self.Row( path )
+        if 0 <= row < self.loaded:
+            index = self.index( row, 0 )
+            self.dataChanged.emit( index, index, [ QtCore.Qt.DecorationRole ] )
+
+    #endregion
+    #region Rows
+
+    def Row( self, path ):
+        if self.rows == None:
+            self.rows = { path : row for row, path in enumerate( self.paths ) }
+        return self.rows.get( path, -1 )
+    def Path( self, row ):
+        if 0 <= row < len( self.paths ):
+            return self.paths[row]
+        return None
+    def Names( self ):
+        return [ os.path.basename( path ) for path in self.paths ]
+    def Highlight_Set( self, paths ):
+        self.highlight = set( paths )
+        if self.loaded > 0:
+            self.dataChanged.emit( self.index( 0, 0 ), self.index( self.loaded - 1, 0 ), [ QtCore.Qt.BackgroundRole ] )
+    def Fetch_Row( self, row ):
+        # Rows past the loaded ones are fetched before being selected
+        while ( row >= self.loaded and self.canFetchMore() == True ):
+            self.fetchMore()
+    def Clear( self ):
+        self.beginResetModel()
+        self.paths = []
+        self.rows = None
+        self.keys = {}
+        self.loaded = 0
+        self.highlight = set()
+        self.pixmaps.clear()
+        self.endResetModel()
+
+    def Reconcile( self, paths, keys ):
+        """
+        Changes the rows to match paths touching only what differs
+        Returns True when something changed
+        """
+        if ( paths == self.paths and keys == self.keys ):
+            return False
+        root = QtCore.QModelIndex()
+        wanted = set( paths )
+        self.rows = None
+
+        # Removed
+        for row in range( len( self.paths ) - 1, -1, -1 ):
+            path = self.paths[row]
+            if path not in wanted:
+                if row < self.loaded:
+                    self.beginRemoveRows( root, row, row )
+                    del self.paths[row]
+                    self.loaded -= 1
+                    self.endRemoveRows()
+                else:
+                    del self.paths[row]
+                self.keys.pop( path, None )
+                self.pixmaps.pop( path, None )
+
+        # First Fill ( one batch of rows, the rest is left to fetchMore )
+        if ( len( self.paths ) == 0 and len( paths ) > 0 ):
+            count = min( self.batch, len( paths ) )
+            self.beginInsertRows( root, 0, count - 1 )
+            self.paths = list( paths )
+            self.keys = { path : keys.get( path, None ) for path in paths }
+            self.loaded = count
+            self.endInsertRows()
+            return True
+
+        # Inserted and Moved ( rows before the current one already match )
+        for row in range( 0, len( paths ) ):
+            path = paths[row]
+            if ( row < len( self.paths ) and self.paths[row] == path ):
+                continue
+            try:old = self.paths.index( path, row )
+            except ValueError:old = None
+            if ( old != None and old < self.loaded ):
+                self.beginMoveRows( root, old, old, root, row )
+                del self.paths[old]
+                self.paths.insert( row, path )
+                self.endMoveRows()
+                continue
+            if old != None:
+                del self.paths[old] # unloaded row comes into view as an insert
+            if row < self.loaded:
+                self.beginInsertRows( root, row, row )
+                self.paths.insert( row, path )
+                self.loaded += 1
+                self.endInsertRows()
+            else:
+                self.paths.insert( row, path )
+        # A short list shows its new rows without waiting for a scroll
+        if self.loaded < min( self.batch, len( self.paths ) ):
+            self.fetchMore()
+
+        # Changed Icons
+        for row, path in enumerate( self.paths ):
+            key = keys.get( path, None )
+            if self.keys.get( path, None ) != key:
+                self.keys[path] = key
+                self.pixmaps.pop( path, None )
+                if row < self.loaded:
+                    index = self.index( row, 0 )
+                    self.dataChanged.emit( index, index, [ QtCore.Qt.DecorationRole ] )
+        return True
+
+    #endregion
+
+
+class Recent_Catalog():
+    """
+    Size and time of each recent project so its icon is drawn from the cache on start
+    """
+
+    #region Initialize
+
+    def __init__( self, path ):
+        # Variables
+        self.path = path
+        self.keys = {} # { project_zip : ( path, size, mtime_ns, "project", icon size ) }
+        self.dirty = False # changes not written yet ( see Flush )
+        self.Load()
+
+    #endregion
+    #region Catalog
+
+    def Load( self ):
+        self.keys = {}
+        try:
+            with open( self.path, "r", encoding="utf-8" ) as file:
+                data = json.load( file )
+            for project, key in data.items():
+                self.keys[project] = tuple( key )
+        except ( OSError, ValueError, AttributeError ):
+            pass
+    def Save( self ):
+        temp = self.path + ".part"
+        try:
+            os.makedirs( os.path.dirname( self.path ), exist_ok=True )
+            with open( temp, "w", encoding="utf-8" ) as file:
+                json.dump( { project : list( key ) for project, key in self.keys.items() }, file )
+            os.replace( temp, self.path )
+            self.dirty = False
+        except OSError:
+            pass
+    def Flush( self ):
+        if self.dirty == True:
+            self.Save()
+    def Get( self, project ):
+        return self.keys.get( project, None )
+    def Set( self, project, key ):
+        if self.keys.get( project, None ) != key:
+            self.keys[project] = key
+            self.dirty = True
+    def Remove( self, project ):
+        if self.keys.pop( project, None ) != None:
+            self.dirty = True
+
+    #endregion
+
+class Recent_Signals( QtCore.QObject ):
+    """
+    Results of the recent project checks delivered to the GUI thread
+    """
+    SIGNAL_RECENT = QtCore.pyqtSignal( str, bool, object, QtGui.QImage )
+
+class Recent_Job( QtCore.QRunnable ):
+    """
+    Checks one recent project and reads its thumbnail when the ZIP changed
+    """
+
+    #region Initialize
+
+    def __init__( self, signals, project, known, size, color, cache, pool ):
+        super( Recent_Job, self ).__init__()
+        self.signals = signals
+        self.project = project
+        self.known = known # key drawn at the moment
+        self.size = size
+        self.color = color
+        self.cache = cache
+        self.pool = pool # Archive_Pool
+
+    #endregion
+    #region Thread
+
+    def run( self ):
+        # Existence ( slow on network drives so never on the GUI thread )
+        try:
+            stat = os.stat( self.project )
+        except OSError:
+            self.signals.SIGNAL_RECENT.emit( self.project, False, None, QtGui.QImage() )
+            return
+        key = ( self.project, stat.st_size, stat.st_mtime_ns, "project", self.size )
+        if ( key == self.known and self.cache.Get( key, False ) != None ):
+            self.signals.SIGNAL_RECENT.emit( self.project, True, key, QtGui.QImage() ) # no change
+            return
+        # Thumbnail
+        qimage = self.cache.Get( key )
+        if qimage == None:
+            source = QtGui.QImage()
+            try:
+                source.loadFromData( self.pool.Read( self.project, "thumbnail.png" ) )
+            except Exception:
+                pass
+            qimage = Thumbnail_Render( source, self.size, self.color, QtCore.Qt.KeepAspectRatio )
+            if source.isNull() == False:
+                self.cache.Put( key, qimage )
+        self.signals.SIGNAL_RECENT.emit( self.project, True, key, qimage )
+
+    #endregion
@@ -0,0 +1,156 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import time
+import sqlite3
+
+#endregion
+#region Global Variables
+
+# Store
+note_database = "notes.sqlite" # at the root of the project folder
+note_version = 1
+
+#endregion
+#region Functions
+
+def Note_Query( text ):
+    # Words of the filter box as quoted prefix terms
+    words = text.split()
+    return " ".join( '"' + w.replace( '"', '""' ) + '"*' for w in words )
+def Note_Like( word ):
+    return "%" + word.replace( "\\", "\\\\" ).replace( "%", "\\%" ).replace( "_", "\\_" ) + "%"
+
+#endregion
+
+
+class Note_Store():
+    """
+    Page notes of a project in a single SQLite database
+    """
+
+    #region Initialize
+
+    def __init__( self, path ):
+        # Variables
+        self.path = path
+        self.connection = sqlite3.connect( path )
+        self.fts = False
+        self.Schema()
+
+    def Close( self ):
+        if self.connection != None:
+            self.connection.close()
+            self.connection = None
+
+    def Schema( self ):
+        with self.connection:
+            self.connection.execute( "CREATE TABLE IF NOT EXISTS notes ( page TEXT PRIMARY KEY, text TEXT NOT NULL DEFAULT '', time REAL )" )
+        # Full text search when SQLite was built with FTS5
+        try:
+            with self.connection:
+                self.connection.execute( "CREATE VIRTUAL TABLE IF NOT EXISTS notes_search USING fts5( text, content='notes', content_rowid='rowid' )" )
+                self.connection.execute( """CREATE TRIGGER IF NOT EXISTS notes_insert AFTER INSERT ON notes BEGIN
+                    INSERT INTO notes_search( rowid, text ) VALUES ( new.rowid, new.text ); END""" )
+                self.connection.execute( """CREATE TRIGGER IF NOT EXISTS notes_delete AFTER DELETE ON notes BEGIN
+                    INSERT INTO notes_search( notes_search, rowid, text ) VALUES ( 'delete', old.rowid, old.text ); END""" )
+                self.connection.execute( """CREATE TRIGGER IF NOT EXISTS notes_update AFTER UPDATE ON notes BEGIN
+                    INSERT INTO notes_search( notes_search, rowid, text ) VALUES ( 'delete', old.rowid, old.text );
+                    INSERT INTO notes_search( rowid, text ) VALUES ( new.rowid, new.text ); END""" )
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        with self.connection:
+            self.connection.execute( f"PRAGMA user_version = { note_version }" )
+
+    #endregion
+    #region Notes
+
+    def Get( self, page ):
+        row = self.connection.execute( "SELECT text FROM notes WHERE page = ?", ( page, ) ).fetchone()
+        return row[0] if row != None else None
+    def Set( self, page, text ):
+        self.Set_Many( { page : text } )
+    def Set_Many( self, notes ):
+        # One transaction for all notes
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO notes ( page, text, time ) VALUES ( ?, ?, ? ) ON CONFLICT( page ) DO UPDATE SET text = excluded.text, time = excluded.time",
+                [ ( page, text, now ) for page, text in notes.items() ] )
+    def Rename( self, old, new, overwrite=False ):
+        # False when the new name is taken, unless its note is replaced
+        with self.connection:
+            taken = self.connection.execute( "SELECT 1 FROM notes WHERE page = ?", ( new, ) ).fetchone()
+            if taken != None:
+                if overwrite == False:
+                    return False
+                self.connection.execute( "DELETE FROM notes WHERE page = ?", ( new, ) )
+            self.connection.execute( "UPDATE notes SET page = ? WHERE page = ?", ( new, old ) )
+        return True
+    def Remove( self, page ):
+        with self.connection:
+            self.connection.execute( "DELETE FROM notes WHERE page = ?", ( page, ) )
+    def Pages( self ):
+        return [ row[0] for row in self.connection.execute( "SELECT page FROM notes ORDER BY page" ) ]
+
+    #endregion
+    #region Search
+
+    def Search( self, text, limit=1000 ):
+        # Pages whose note has every word, best matches first
+        words = text.split()
+        if len( words ) == 0:
+            return []
+        if self.fts == True:
+            try:
+                rows = self.connection.execute(
+                    "SELECT notes.page FROM notes_search JOIN notes ON notes.rowid = notes_search.rowid WHERE notes_search MATCH ? ORDER BY rank LIMIT ?",
+                    ( Note_Query( text ), limit ) )
+                return [ row[0] for row in rows ]
+            except sqlite3.OperationalError:
+                pass
+        where = " AND ".join( [ "text LIKE ? ESCAPE '\\'" ] * len( words ) )
+        rows = self.connection.execute(
+            f"SELECT page FROM notes WHERE { where } ORDER BY page LIMIT ?",
+            [ Note_Like( w ) for w in words ] + [ limit ] )
+        return [ row[0] for row in rows ]
+
+    #endregion
+    #region Migration
+
+    def Migrate( self, texts, reader ):
+        """
+        texts : { page : path of the .eo file }
+        reader : function returning the text of a path
+        Notes already in the store are kept
+        """
+        known = set( self.Pages() )
+        notes = {}
+        for page, path in texts.items():
+            if page not in known:
+                try:notes[page] = reader( path )
+                except OSError:pass
+        if len( notes ) > 0:
+            self.Set_Many( notes )
+        return len( notes )
+
+    #endregion
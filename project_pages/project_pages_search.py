@@ -0,0 +1,299 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import time
+import shutil
+import fnmatch
+import tempfile
+import threading
+import concurrent.futures
+
+#endregion
+#region Global Variables
+
+# Search
+search_batch = 64 # matches per batch
+search_interval = 0.1 # seconds between count updates
+
+#endregion
+
+
+class Search_Files():
+    """
+    Walks a directory tree in worker threads and streams matches in batches
+    """
+
+    #region Initialize
+
+    def __init__( self, root, patterns, known=[], workers=None, batch=search_batch ):
+        # Variables
+        self.root = os.path.normpath( root )
+        self.patterns = [ p.lower() for p in patterns ]
+        self.known = set( os.path.normpath( k ) for k in known )
+        self.workers = workers if workers != None else min( 8, ( os.cpu_count() or 1 ) * 2 )
+        self.batch = batch
+        self.cancel = threading.Event()
+        # Counts
+        self.scanned = 0
+        self.found = 0
+
+    def Cancel( self ):
+        self.cancel.set()
+
+    #endregion
+    #region Scan
+
+    def Match( self, name ):
+        lowered = name.lower()
+        return any( fnmatch.fnmatch( lowered, p ) for p in self.patterns )
+    def Scan_Folder( self, path ):
+        # Subfolders, matches and the number of files of one folder
+        folders = []
+        matches = []
+        count = 0
+        if self.cancel.is_set() == True:
+            return folders, matches, count
+        try:
+            with os.scandir( path ) as scan:
+                for entry in scan:
+                    try:
+                        if entry.is_dir( follow_symlinks=False ) == True:
+                            folders.append( entry.path )
+                        elif entry.is_file() == True:
+                            count += 1
+                            if self.Match( entry.name ) == True:
+                                matches.append( os.path.normpath( entry.path ) )
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return folders, matches, count
+    def Run( self, batch=None, count=None ):
+        """
+        batch : function receiving each list of new matches
+        count : function receiving ( scanned, found ) while running
+        """
+        # Variables
+        start = time.perf_counter()
+        found = []
+        seen = set( self.known )
+        buffer = []
+        last = 0
+
+        # Breadth first, each finished folder queues its subfolders
+        with concurrent.futures.ThreadPoolExecutor( max_workers=self.workers ) as executor:
+            pending = { executor.submit( self.Scan_Folder, self.root ) }
+            while len( pending ) > 0:
+                done, pending = concurrent.futures.wait( pending, return_when=concurrent.futures.FIRST_COMPLETED )
+                if self.cancel.is_set() == True:
+                    for future in pending:
+                        future.cancel()
+                    break
+                for future in done:
+                    folders, matches, number = future.result()
+                    self.scanned += number
+                    for folder in folders:
+                        pending.add( executor.submit( self.Scan_Folder, folder ) )
+                    for path in matches:
+                        if path not in seen:
+                            seen.add( path )
+                            found.append( path )
+                            buffer.append( path )
+                self.found = len( found )
+                # Stream
+                if ( batch != None and len( buffer ) >= self.batch ):
+                    batch( buffer )
+                    buffer = []
+                now = time.perf_counter()
+                if ( count != None and now - last >= search_interval ):
+                    count( self.scanned, self.found )
+                    last = now
+
+        # Last batch
+        if ( batch != None and len( buffer ) > 0 ):
+            batch( buffer )
+        if count != None:
+            count( self.scanned, self.found )
+        report = {
+            "found" : found,
+            "scanned" : self.scanned,
+            "cancelled" : self.cancel.is_set(),
+            "time" : time.perf_counter() - start,
+            }
+        return report
+
+    #endregion
+
+
+class Copy_Files():
+    """
+    Copies files through a bounded pool so only a few copies are in flight
+    """
+
+    #region Initialize
+
+    def __init__( self, workers=4, window=None ):
+        # Variables
+        self.workers = workers
+        self.window = window if window != None else workers * 2
+        self.cancel = threading.Event()
+        self.lock = threading.Lock()
+        self.taken = set() # names in the destination that are not on disk ( pages still in the ZIP and copies in flight )
+
+    def Cancel( self ):
+        self.cancel.set()
+    def Reserve( self, names ):
+        with self.lock:
+            self.taken.update( name.lower() for name in names )
+
+    #endregion
+    #region Copy
+
+    def Target( self, source, destination ):
+        # Free name in the destination, "name_0001.ext" when the name is taken
+        stem, extension = os.path.splitext( os.path.basename( source ) )
+        with self.lock:
+            name = stem + extension
+            i = 0
+            while ( name.lower() in self.taken or os.path.exists( os.path.join( destination, name ) ) ):
+                i += 1
+                name = f"{ stem }_{ str( i ).zfill( 4 ) }{ extension }"
+            self.taken.add( name.lower() )
+        return os.path.join( destination, name )
+    def Copy( self, source, destination ):
+        # Written aside then swapped in so a cancelled copy leaves nothing behind
+        target = self.Target( source, destination )
+        handle, temp = tempfile.mkstemp( suffix=".part", dir=destination )
+        os.close( handle )
+        try:
+            shutil.copyfile( source, temp )
+            shutil.copystat( source, temp )
+            os.replace( temp, target )
+        except Exception:
+            try:os.remove( temp )
+            except OSError:pass
+            raise
+        return target
+    def Run( self, sources, destination, progress=None ):
+        """
+        Returns { "copied" : [ ( source, target ) ], "failed" : [ ( source, error ) ], "cancelled" }
+        progress : function receiving ( index, total )
+        """
+        copied = []
+        failed = []
+        total = len( sources )
+        index = 0
+        queue = list( reversed( sources ) )
+        with concurrent.futures.ThreadPoolExecutor( max_workers=self.workers ) as executor:
+            running = {}
+            while ( len( queue ) > 0 or len( running ) > 0 ):
+                # Refill the window
+                while ( len( queue ) > 0 and len( running ) < self.window and self.cancel.is_set() == False ):
+                    source = queue.pop()
+                    running[executor.submit( self.Copy, source, destination )] = source
+                if len( running ) == 0:
+                    break
+                done, _ = concurrent.futures.wait( running, return_when=concurrent.futures.FIRST_COMPLETED )
+                for future in done:
+                    source = running.pop( future )
+                    try:copied.append( ( source, future.result() ) )
+                    except OSError as e:failed.append( ( source, str( e ) ) )
+                    index += 1
+                    if progress != None:
+                        progress( index, total )
+        report = {
+            "copied" : copied,
+            "failed" : failed,
+            "cancelled" : self.cancel.is_set(),
+            }
+        return report
+
+    #endregion
+
+
+class Search_Import():
+    """
+    Imports the matches of a running search batch by batch while the walk goes on
+    """
+
+    #region Initialize
+
+    def __init__( self, destination, content, existing, opener, workers=4 ):
+        # Variables
+        self.destination = destination
+        self.content = content # Index_Content ( duplicates are skipped )
+        self.existing = dict( existing ) # { path : size } pages a match is compared against
+        self.opener = opener # function( path ) returning a binary file of a project page
+        self.copy = Copy_Files( workers )
+        self.copy.Reserve( os.path.basename( path ) for path in existing )
+        self.progress = None # function receiving ( imported, found )
+        # Batches are planned and copied in order on a thread of their own
+        self.queue = concurrent.futures.ThreadPoolExecutor( max_workers=1 )
+        self.futures = []
+        self.lock = threading.Lock()
+        self.found = 0
+        self.imported = 0
+        self.report = {
+            "copied" : [],
+            "failed" : [],
+            "duplicates" : [],
+            "bytes_saved" : 0,
+            "cancelled" : False,
+            }
+
+    def Cancel( self ):
+        self.copy.Cancel()
+
+    #endregion
+    #region Import
+
+    def Add( self, batch ):
+        with self.lock:
+            self.found += len( batch )
+        self.futures.append( self.queue.submit( self.Import, list( batch ) ) )
+    def Import( self, batch ):
+        if self.copy.cancel.is_set() == True:
+            return
+        plan = self.content.Import_Plan( batch, self.existing, self.opener )
+        report = self.copy.Run( plan["unique"], self.destination )
+        # Later batches are compared against the pages copied now
+        for source, target in report["copied"]:
+            try:self.existing[target] = os.path.getsize( target )
+            except OSError:pass
+        with self.lock:
+            self.report["copied"].extend( report["copied"] )
+            self.report["failed"].extend( report["failed"] )
+            self.report["duplicates"].extend( plan["duplicates"] )
+            self.report["bytes_saved"] += plan["bytes_saved"]
+            self.imported += len( batch )
+            imported, found = self.imported, self.found
+        if self.progress != None:
+            self.progress( imported, found )
+    def Finish( self ):
+        # Waits for the batches still queued
+        for future in self.futures:
+            try:future.result()
+            except Exception as e:self.report["failed"].append( ( "", str( e ) ) )
+        self.queue.shutdown( wait=True )
+        self.report["cancelled"] = self.copy.cancel.is_set()
+        return self.report
+
+    #endregion
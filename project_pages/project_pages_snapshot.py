@@ -0,0 +1,324 @@
+# Project Pages is a Krita plugin to Compile files into a single project file.
+# Copyright ( C ) 2022  Ricardo Jeremias.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# ( at your option ) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#region Imports
+
+# Python Modules
+import os
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import tempfile
+# Plugin Modules
+try:from .project_pages_archive import *
+except ImportError:from project_pages_archive import * # benchmark run as a script
+
+#endregion
+#region Global Variables
+
+# Store
+snapshot_extension = ".snapshots"
+snapshot_versions = "versions.json"
+snapshot_version = 1
+# Chunks ( fixed blocks of each member, hashed outside the GIL so a save is not held back by the store )
+chunk_size = 1024 * 1024
+
+#endregion
+#region Functions
+
+def Snapshot_Directory( project_zip ):
+    # "name.project_pages.zip" keeps its snapshots in "name.project_pages.snapshots"
+    base = project_zip[:-4] if project_zip.lower().endswith( ".zip" ) else project_zip
+    return base + snapshot_extension
+def Chunk_Stream( file ):
+    # Chunks of a file object, an edit in place only changes the blocks it touches
+    while True:
+        block = file.read( chunk_size )
+        if not block:
+            break
+        yield block
+
+#endregion
+
+
+class Snapshot_Store():
+    """
+    Versions of a Project ZIP kept as deduplicated chunks next to it
+    """
+
+    #region Initialize
+
+    def __init__( self, directory, limit=10 ):
+        # Variables
+        self.directory = directory
+        self.limit = limit
+        self.chunks = os.path.join( directory, "chunks" )
+        self.versions = []
+        self.Versions_Load()
+
+    #endregion
+    #region Versions
+
+    def Versions_Load( self ):
+        path = os.path.join( self.directory, snapshot_versions )
+        self.versions = []
+        try:
+            with open( path, "r", encoding="utf-8" ) as file:
+                data = json.load( file )
+            if data.get( "version", 0 ) <= snapshot_version:
+                self.versions = data["snapshots"]
+        except ( OSError, ValueError, KeyError ):
+            pass
+    def Versions_Save( self ):
+        os.makedirs( self.directory, exist_ok=True )
+        path = os.path.join( self.directory, snapshot_versions )
+        temp = path + ".part"
+        with open( temp, "w", encoding="utf-8" ) as file:
+            json.dump( { "version" : snapshot_version, "snapshots" : self.versions }, file, indent=1 )
+        os.replace( temp, path )
+    def Version_Get( self, number ):
+        for version in self.versions:
+            if version["id"] == number:
+                return version
+        return None
+    def List( self ):
+        # Newest first
+        lista = []
+        for version in reversed( self.versions ):
+            lista.append( {
+                "id" : version["id"],
+                "time" : version["time"],
+                "label" : version["label"],
+                "size" : version["size"],
+                "stored" : version["stored"],
+                } )
+        return lista
+
+    #endregion
+    #region Chunks
+
+    def Chunk_Path( self, digest ):
+        return os.path.join( self.chunks, digest[:2], digest )
+    def Chunk_Write( self, data ):
+        # Returns the digest and the bytes written ( 0 when the chunk is known )
+        digest = hashlib.blake2b( data, digest_size=20 ).hexdigest()
+        path = self.Chunk_Path( digest )
+        if os.path.exists( path ) == True:
+            return digest, 0
+        os.makedirs( os.path.dirname( path ), exist_ok=True )
+        temp = path + ".part"
+        with open( temp, "wb" ) as file:
+            file.write( data )
+        os.replace( temp, path )
+        return digest, len( data )
+    def Chunk_Read( self, digest ):
+        with open( self.Chunk_Path( digest ), "rb" ) as file:
+            return file.read()
+    def Chunk_Key( self, name, crc, size, date_time ):
+        # A crc alone can collide, the same member at the same time cannot
+        return ( name, crc, size, tuple( date_time ) )
+    def Chunk_Known( self ):
+        # Chunk lists of members already stored { ( name, crc, size, date_time ) : chunks }
+        known = {}
+        for version in self.versions:
+            for member in version["members"]:
+                if "chunks" in member:
+                    known[self.Chunk_Key( member["name"], member["crc"], member["size"], member["date_time"] )] = member["chunks"]
+        return known
+
+    #endregion
+    #region Snapshot
+
+    def Snapshot( self, project_zip, label="" ):
+        # Variables
+        start = time.perf_counter()
+        known = self.Chunk_Known()
+        members = []
+        size = 0
+        stored = 0
+
+        # Members ( unchanged members reuse their chunk list without being read )
+        with zipfile.ZipFile( project_zip, "r" ) as archive:
+            for info in archive.infolist():
+                member = {
+                    "name" : info.filename,
+                    "date_time" : list( info.date_time ),
+                    "compress_type" : info.compress_type,
+                    }
+                if info.is_dir() == False:
+                    key = self.Chunk_Key( info.filename, info.CRC, info.file_size, info.date_time )
+                    if key in known:
+                        chunks = known[key]
+                    else:
+                        chunks = []
+                        with archive.open( info, "r" ) as file:
+                            for data in Chunk_Stream( file ):
+                                digest, written = self.Chunk_Write( data )
+                                chunks.append( digest )
+                                stored += written
+                        known[key] = chunks
+                    member["crc"] = info.CRC
+                    member["size"] = info.file_size
+                    member["chunks"] = chunks
+                    size += info.file_size
+                members.append( member )
+
+        # Version
+        number = self.versions[-1]["id"] + 1 if len( self.versions ) > 0 else 1
+        self.versions.append( {
+            "id" : number,
+            "time" : time.time(),
+            "label" : label,
+            "size" : size,
+            "stored" : stored,
+            "members" : members,
+            } )
+        self.Versions_Save()
+
+        # Limit
+        freed = 0
+        if self.limit > 0:
+            freed = self.Prune( self.limit )
+        report = {
+            "id" : number,
+            "size" : size,
+            "stored" : stored,
+            "freed" : freed,
+            "time" : time.perf_counter() - start,
+            }
+        return report
+    def Restore( self, number, destination, replace=os.replace ):
+        # Rebuild a version as a Project ZIP, written aside and swapped in by replace( temp, destination )
+        version = self.Version_Get( number )
+        if version == None:
+            raise KeyError( f"snapshot { number } does not exist" )
+        handle, temp = tempfile.mkstemp( suffix=".part", dir=os.path.dirname( os.path.abspath( destination ) ) )
+        os.close( handle )
+        try:
+            with zipfile.ZipFile( temp, "w" ) as archive:
+                for member in version["members"]:
+                    info = zipfile.ZipInfo( member["name"], tuple( member["date_time"] ) )
+                    info.compress_type = member["compress_type"]
+                    if member["name"].endswith( "/" ):
+                        info.external_attr = 0o40775 << 16 | 0x10
+                        archive.writestr( info, b"" )
+                        continue
+                    info.external_attr = 0o644 << 16
+                    with archive.open( info, "w", force_zip64=member["size"] > 0x7fffffff ) as file:
+                        for digest in member["chunks"]:
+                            file.write( self.Chunk_Read( digest ) )
+                    if archive.getinfo( member["name"] ).CRC != member["crc"]:
+                        raise ValueError( f"snapshot { number } member { member['name'] } is damaged" )
+            os.chmod( temp, 0o644 )
+            replace( temp, destination )
+        except Exception:
+            try:os.remove( temp )
+            except OSError:pass
+            raise
+    def Prune( self, limit=None, numbers=[] ):
+        # Drop old or selected versions then the chunks nobody uses
+        if limit != None and limit > 0:
+            self.versions = self.versions[-limit:]
+        self.versions = [ v for v in self.versions if v["id"] not in numbers ]
+        self.Versions_Save()
+        return self.Collect()
+    def Collect( self ):
+        used = set()
+        for version in self.versions:
+            for member in version["members"]:
+                used.update( member.get( "chunks", [] ) )
+        freed = 0
+        if os.path.isdir( self.chunks ) == True:
+            for folder in os.listdir( self.chunks ):
+                path_folder = os.path.join( self.chunks, folder )
+                for digest in os.listdir( path_folder ):
+                    if digest not in used:
+                        path = os.path.join( path_folder, digest )
+                        freed += os.path.getsize( path )
+                        os.remove( path )
+                if len( os.listdir( path_folder ) ) == 0:
+                    os.rmdir( path_folder )
+        return freed
+    def Stored_Size( self ):
+        total = 0
+        for root, folders, files in os.walk( self.directory ):
+            for name in files:
+                total += os.path.getsize( os.path.join( root, name ) )
+        return total
+
+    #endregion
+
+
+#region Benchmark
+
+def Benchmark_Edit( path, offset, size ):
+    # Painting over part of a page
+    with open( path, "r+b" ) as page:
+        page.seek( offset )
+        page.write( os.urandom( size ) )
+def Benchmark_Snapshot( pages=60, page_size=2*1024*1024, edits=[ 0, 1, 4, 16 ] ):
+    """
+    Bytes stored by each snapshot against copying the whole Project ZIP
+    """
+    lines = []
+    with tempfile.TemporaryDirectory() as temp:
+        directory = os.path.join( temp, "bench.temp" )
+        destination = os.path.join( temp, "bench.project_pages.zip" )
+        Benchmark_Project( directory, pages, page_size )
+        writer = Archive_Incremental()
+        writer.Save( directory, destination )
+        store = Snapshot_Store( Snapshot_Directory( destination ), limit=0 )
+        lines.append( f"project { pages } pages x { page_size // 1024 } KiB ( zip { os.path.getsize( destination ) // 1024 } KiB )" )
+
+        # First snapshot stores everything, later ones only the edited chunks
+        report = store.Snapshot( destination, "initial" )
+        lines.append( f"snapshot initial      { report['time']:8.3f} s  { report['stored'] // 1024:8d} KiB stored" )
+        for count in edits:
+            count = min( count, pages )
+            for i in range( 0, count ):
+                name = f"page_{ str( i + 1 ).zfill( 4 ) }.kra"
+                Benchmark_Edit( os.path.join( directory, "IMAGES", name ), page_size // 3, 64 * 1024 )
+            writer.Save( directory, destination )
+            report = store.Snapshot( destination, f"{ count } edits" )
+            lines.append( f"snapshot { count:3d} edits    { report['time']:8.3f} s  { report['stored'] // 1024:8d} KiB stored" )
+        lines.append( f"store total           { store.Stored_Size() // 1024:8d} KiB for { len( store.versions ) } versions" )
+        lines.append( f"full copies           { os.path.getsize( destination ) * len( store.versions ) // 1024:8d} KiB" )
+
+        # Restore
+        restored = os.path.join( temp, "restored.project_pages.zip" )
+        start = time.perf_counter()
+        store.Restore( store.versions[-1]["id"], restored )
+        lines.append( f"restore               { time.perf_counter() - start:8.3f} s" )
+        with zipfile.ZipFile( restored, "r" ) as archive:
+            bad = archive.testzip()
+        lines.append( f"archive test          { 'OK' if bad == None else bad }" )
+
+        # Prune
+        freed = store.Prune( 2 )
+        lines.append( f"prune to 2 versions   { freed // 1024:8d} KiB freed" )
+
+    for line in lines:
+        print( line )
+    return lines
+
+#endregion
+
+
+if __name__ == "__main__":
+    Benchmark_Snapshot()